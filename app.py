@@ -125,7 +125,8 @@ import os
 import pandas as pd
 import io
 from dotenv import load_dotenv
-import parse_book_entries
+import catalog
+from parse_book_entries import format_price
 
 st.set_page_config(page_title="AI Book Boss", layout="wide")
 
@@ -134,6 +135,18 @@ st.set_page_config(page_title="AI Book Boss", layout="wide")
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Run the strict and broad searches concurrently (set to 0 to run them one after the other)
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "1") != "0"
+# Also reuse answers from near-identical searches (costs one embedding call per miss)
+SEMANTIC_QUERY_CACHE = os.getenv("SEMANTIC_QUERY_CACHE", "0") == "1"
+# Write answers into the page token by token as they are generated
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+# "hybrid" fuses BM25 keyword and vector search, "lexical" skips the query embedding, "vector" is FAISS only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# "openai" embeddings (cached), or "hashing" to build and search the index locally with no API calls
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "openai")
+# Catalog backend for keyword search: "sqlite" adds an offline FTS5 search box
+CATALOG_BACKEND = os.getenv("CATALOG_BACKEND", "memory")
 
 # Initialize session state
 if "user_submissions" not in st.session_state:
@@ -141,31 +154,51 @@ if "user_submissions" not in st.session_state:
 if "cart" not in st.session_state:
     st.session_state.cart = []
 
-# Parse collections
-COLLECTION = parse_book_entries.parse_book_entries("data/book_entries.txt")
+# Parse collections (once per process; re-parsed only when the file changes)
+COLLECTION = catalog.load_catalog("data/book_entries.txt")
+PRICES = catalog.load_price_matrix("data/book_entries.txt")
+TITLES = catalog.load_title_index("data/book_entries.txt")
+INDIVIDUALS = catalog.load_individuals("data/indivuals.txt")
+RECORDS = catalog.load_record_index("data/book_entries.txt")
+CATALOG_DB = catalog.load_catalog_db("data/book_entries.txt") if CATALOG_BACKEND == "sqlite" else None
 
 # Load LangChain retriever if API key exists
 if OPENAI_API_KEY:
     from langchain_community.llms import OpenAI
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    from langchain.schema import Document
-    from langchain.embeddings import OpenAIEmbeddings
     from langchain.vectorstores import FAISS
     from langchain.chains import RetrievalQA
     import re
     from filters import grade_in_page
+    from index_store import load_or_build_index
+    from query_cache import QueryCache
+    from llm_gateway import GatewayBusy
+    from embedding_backends import make_embeddings
+    from langchain_helper import (
+        book_documents,
+        catalog_retriever,
+        grade_retriever,
+        get_response,
+        get_response_speculative,
+        is_answer,
+        split_sources,
+        stream_response,
+    )
+
+    @st.cache_resource(max_entries=1)
+    def load_books(catalog_version):
+        # on-disk index; when data/book_entries.txt changes only the edited
+        # records are re-embedded (through the embedding cache) and swapped in
+        embeddings = make_embeddings(EMBEDDINGS_BACKEND)
+        db = load_or_build_index("data/book_entries.txt", book_documents, embeddings)
+        return catalog_retriever(db, RETRIEVAL_MODE)
 
     @st.cache_resource
-    def load_books():
-        with open("data/book_entries.txt", "r", encoding="utf-8") as f:
-            text = f.read()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        docs = splitter.split_documents([Document(page_content=text)])
-        embeddings = OpenAIEmbeddings()
-        db = FAISS.from_documents(docs, embeddings)
-        return db.as_retriever()
-
-    retriever = load_books()
+    def load_query_cache():
+        embeddings = retriever.vectorstore.embeddings if SEMANTIC_QUERY_CACHE else None
+        return QueryCache(embeddings=embeddings)
+
+    retriever = load_books(catalog.catalog_version("data/book_entries.txt"))
+    query_cache = load_query_cache()
 else:
     st.warning("⚠️ OpenAI API key not found. AI features are disabled. You can still develop the app layout!")
 
@@ -206,33 +239,80 @@ if st.button("Find Collection"):
             f"Find book collections specifically for {grade} students about '{theme}' in the subject '{subject}'. "
             f"Return the collection name, description, and list of books."
         )
-        strict_response = get_response(strict_query, retriever)
+        broad_query = (
+            f"Find any book collections related to '{theme}' or '{subject}' for elementary to high school students. "
+            f"Return the collection name, description, and list of books."
+        )
+        # only search records whose grade range overlaps the selected band
+        strict_retriever = grade_retriever(retriever, grade)
 
         st.subheader("📚 Matching Collections:")
 
-        if strict_response and "i don't know" in strict_response.lower():
-            st.error("Sorry, no collections found matching that grade, subject, and theme. Please try broader keywords.")
-            st.session_state.generated_book_list = None
-        elif strict_response and strict_response.strip():
-            st.session_state.generated_book_list = strict_response
-        else:
-            # Fallback broad search
-            st.warning("No exact match found! Searching more broadly...")
-
-            broad_query = (
-                f"Find any book collections related to '{theme}' or '{subject}' for elementary to high school students. "
-                f"Return the collection name, description, and list of books."
-            )
-            broad_response = get_response(broad_query, retriever)
-
-            if broad_response and "i don't know" in broad_response.lower():
-                st.error("Sorry, no collections found even after broad search. Please try different keywords.")
-                st.session_state.generated_book_list = None
-            elif broad_response and broad_response.strip():
-                st.session_state.generated_book_list = broad_response
+        # answers are cached per catalog version, so edits to the catalog invalidate them
+        catalog_version = catalog.catalog_version("data/book_entries.txt")
+        try:
+            # a semantic lookup embeds the search, so it can hit GatewayBusy too
+            cached_answer = query_cache.get(grade, subject, theme, catalog_version)
+            if cached_answer:
+                st.session_state.generated_book_list = cached_answer
+            elif STREAM_RESPONSES:
+                # show the strict answer as it is generated, then the broad one if needed;
+                # only the answer is kept, like response["answer"], not its SOURCES: line
+                answer, _ = split_sources(st.write_stream(stream_response(strict_query, strict_retriever)))
+
+                if not is_answer(answer):
+                    st.warning("No exact match found! Searching more broadly...")
+                    answer, _ = split_sources(st.write_stream(stream_response(broad_query, retriever)))
+
+                if is_answer(answer):
+                    st.session_state.generated_book_list = answer
+                    query_cache.put(grade, subject, theme, catalog_version, answer)
+                else:
+                    st.error("Sorry, no collections found even after broad search. Please try different keywords.")
+                    st.session_state.generated_book_list = None
             else:
-                st.error("No results found. Please try again later.")
-                st.session_state.generated_book_list = None
+                if SPECULATIVE_SEARCH:
+                    # strict and broad run together; a miss costs one round-trip, not two
+                    response, used = get_response_speculative(strict_query, strict_retriever, broad_query, retriever)
+                    answer = response["answer"]
+
+                    if used == "broad":
+                        st.warning("No exact match found! Showing broader results...")
+
+                    if is_answer(answer):
+                        st.session_state.generated_book_list = answer
+                    else:
+                        st.error("Sorry, no collections found even after broad search. Please try different keywords.")
+                        st.session_state.generated_book_list = None
+                else:
+                    strict_response = get_response(strict_query, strict_retriever)["answer"]
+
+                    if strict_response and "i don't know" in strict_response.lower():
+                        st.error("Sorry, no collections found matching that grade, subject, and theme. Please try broader keywords.")
+                        st.session_state.generated_book_list = None
+                    elif strict_response and strict_response.strip():
+                        st.session_state.generated_book_list = strict_response
+                    else:
+                        # Fallback broad search
+                        st.warning("No exact match found! Searching more broadly...")
+
+                        broad_response = get_response(broad_query, retriever)["answer"]
+
+                        if broad_response and "i don't know" in broad_response.lower():
+                            st.error("Sorry, no collections found even after broad search. Please try different keywords.")
+                            st.session_state.generated_book_list = None
+                        elif broad_response and broad_response.strip():
+                            st.session_state.generated_book_list = broad_response
+                        else:
+                            st.error("No results found. Please try again later.")
+                            st.session_state.generated_book_list = None
+
+                if st.session_state.generated_book_list:
+                    query_cache.put(grade, subject, theme, catalog_version, st.session_state.generated_book_list)
+        except GatewayBusy:
+            # too many searches in flight; fail fast instead of timing out
+            st.error("The assistant is busy right now. Please try again in a moment.")
+            st.session_state.generated_book_list = None
 
         # ✅ Always save the submission, whether strict or broad
         st.session_state.user_submissions.append({
@@ -289,27 +369,88 @@ if st.session_state.user_submissions:
 else:
     st.info("No submissions yet. Try finding a collection first!")
 
+def individual_listings(listings):
+    """Individual listings as a table, with the catalog collection and sets each one is linked to."""
+    table = pd.DataFrame(listings)
+    links = [INDIVIDUALS.collection_entries(record) for record in listings]
+    if any(entry or offerings for entry, offerings in links):
+        table["Catalog collection"] = [
+            f"{entry['collection']}: " + ", ".join(f"{g} {p}" for g, p in entry["grades"].items()) if entry else ""
+            for entry, _ in links
+        ]
+        table["Also in"] = [", ".join(f"{c} ({g})" for _, c, g in offerings) for _, offerings in links]
+    return table
+
+# ✅ Title lookup (served from the in-memory title index, no AI call)
+st.title("🔎 Find a Book Title")
+
+title_query = st.text_input("Which collections include... (e.g., Frida)")
+if title_query:
+    matches = TITLES.prefix(title_query)
+    if matches:
+        st.dataframe(pd.DataFrame(matches, columns=["Title", "Collection", "Grade"]))
+    else:
+        st.info("No collections include a title starting with that.")
+
+    singles = INDIVIDUALS.by_title(title_query)
+    if singles:
+        st.write("Also sold individually:")
+        st.dataframe(individual_listings(singles))
+
+if CATALOG_DB is not None:
+    keyword_query = st.text_input("Search descriptions and titles (e.g., hurricane, neurodiversity)")
+    if keyword_query:
+        hits = CATALOG_DB.search(keyword_query)
+        if hits:
+            st.dataframe(pd.DataFrame(
+                [(h.collection, h.grade, "" if h.price is None else format_price(h.price), h.snippet) for h in hits],
+                columns=["Collection", "Grade", "Price", "Match"],
+            ))
+        else:
+            st.info("No collections match those words.")
+
+author_query = st.text_input("Find individual books by author (e.g., Andrea Davis Pinkney)")
+if author_query:
+    authors = INDIVIDUALS.authors(author_query)
+    if authors:
+        for author, listings in authors:
+            st.write(f"**{author}**")
+            st.dataframe(individual_listings(listings))
+    else:
+        st.info("No individual books by that author.")
+
 # Buttons
 st.title("Build Your Cart")
 
 collection_names = [c["collection"] for c in COLLECTION]
 chosen_name = st.selectbox("Select a Collection:", collection_names)
 
-chosen_col = next(c for c in COLLECTION if c["collection"] == chosen_name)
-grades_dict = chosen_col["grades"]
-
-grade_price_labels = [f"{g} – {p}" for g, p in grades_dict.items()]
-chosen_label = st.selectbox("Select Grade & Price:", grade_price_labels)
-
-grade_selected, price_selected = chosen_label.split(" – ")
+# grade offerings and prices come straight from the integer-cent price matrix
+grade_selected = st.selectbox(
+    "Select Grade & Price:",
+    [g for g, _ in PRICES.offerings(chosen_name)],
+    format_func=lambda g: PRICES.label(chosen_name, g),
+)
+cents_selected = PRICES.price(chosen_name, grade_selected)
+price_selected = format_price(cents_selected)
 
 st.markdown(f"**Selected:** {grade_selected}   |   **Price:** {price_selected}")
 
+# only the selected record's description and book list are decoded, straight from the mmapped file
+record_id = RECORDS.find(chosen_name, grade_selected)
+if record_id:
+    with st.expander("Description & books"):
+        record = RECORDS.record(record_id)
+        st.write(record.description)
+        for title in record.titles:
+            st.write(f"- {title}")
+
 if st.button("Add to Cart"):
     st.session_state.cart.append({
         "Collection": chosen_name,
         "Grade": grade_selected,
-        "Price": price_selected
+        "Price": price_selected,
+        "Cents": cents_selected
     })
     st.success(f"Added {chosen_name} – {grade_selected} ({price_selected}) to cart!")
 
@@ -323,12 +464,10 @@ else:
 
 # --- Cart Total and Checkout ---
 
-def _price_to_float(price_str):
-    return float(price_str.replace("$", "").replace(",", "").strip())
-
-cart_total = sum(_price_to_float(it["Price"]) for it in st.session_state.cart)
-st.markdown(f"**Cart Total:** ${cart_total}")
+# cents as priced when each item was added, so no string parsing here
+cart_total = format_price(sum(it["Cents"] for it in st.session_state.cart))
+st.markdown(f"**Cart Total:** {cart_total}")
 
 if st.session_state.cart and st.button("✅ Checkout"):
-    st.success(f"Thank you! Your payment of **${cart_total:,.2f}** was processed! 🎉")
+    st.success(f"Thank you! Your payment of **{cart_total}** was processed! 🎉")
     st.session_state.cart = []
@@ -0,0 +1,103 @@
+"""
+Per-worker memory of the in-memory catalog: the original list-of-dicts
+layout against the interned, __slots__-based one.
+
+    python benchmarks/catalog_memory.py [--scale N]
+
+--scale repeats every catalog record N times under distinct collection
+names, to approximate a vendor-sized catalog.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import catalog  # noqa: E402
+from parse_book_entries import iter_records, parse_book_entries  # noqa: E402
+
+
+def legacy_parse_book_entries(file_path):
+    """parse_book_entries as it was before typed records: plain dicts of raw strings."""
+    collections = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    current_name = None
+    current_grade = None
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith("Collection:"):
+            current_name = line.replace("Collection:", "").strip()
+            if current_name not in collections:
+                collections[current_name] = {"collection": current_name, "grades": {}}
+            current_grade = None
+        elif line.startswith("Grade:"):
+            current_grade = line.replace("Grade:", "").strip()
+        elif line.startswith("Your Price:") and current_name and current_grade:
+            collections[current_name]["grades"][current_grade] = line.replace("Your Price:", "").strip()
+            current_grade = None
+    return list(collections.values())
+
+
+def legacy_records(file_path):
+    """Every record as a plain dict with its own copies of every string."""
+    return [
+        {
+            "collection": r.collection, "grade": r.grade, "list_price": r.list_price,
+            "price": r.price, "savings": r.savings, "description": r.description,
+            "titles": [t.encode("utf-8").decode("utf-8") for t in r.titles],
+        }
+        for r in iter_records(file_path)
+    ]
+
+
+def scaled_catalog(file_path, scale):
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    blocks = [b for b in text.split("\n---\n") if b.strip()]
+    out = []
+    for copy in range(scale):
+        for block in blocks:
+            out.append(block.replace("Collection: ", f"Collection: Vendor {copy} ", 1) if copy else block)
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write("\n---\n".join(out))
+    return path
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--catalog", default="data/book_entries.txt")
+    args = parser.parse_args()
+
+    path = scaled_catalog(args.catalog, args.scale) if args.scale > 1 else args.catalog
+    try:
+        rows = [
+            ("collections: list of dicts (original)", lambda: legacy_parse_book_entries(path)),
+            ("collections: CollectionEntry, interned", lambda: catalog._freeze(parse_book_entries(path))),
+            ("records: plain dicts", lambda: legacy_records(path)),
+            ("records: __slots__ BookRecord, interned", lambda: list(iter_records(path))),
+        ]
+        print(f"catalog: {path} (scale {args.scale})")
+        for label, build in rows:
+            print(f"{label:<42} {measure(build) / 1024:10.1f} KiB")
+    finally:
+        if path != args.catalog:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Recall against exact search vs per-query latency for the FAISS index types
+load_or_build_index supports (flat, ivf, ivfpq, hnsw), across nprobe /
+efSearch settings, to pick an operating point per deployment.
+
+    python benchmarks/index_types.py [--count N] [--dim D] [--queries Q] [--k K]
+    python benchmarks/index_types.py --source catalog --scale 100
+
+The default source is clustered synthetic vectors, sized like a vendor
+catalog of title-level documents. --source catalog instead embeds every
+(book title, collection, grade) of data/book_entries.txt, repeated --scale
+times under distinct collection names, with the local hashing backend.
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from index_store import IndexConfig, build_index, factory_string, search_parameters, tune_index  # noqa: E402
+
+SWEEPS = {
+    "flat": [{}],
+    "ivf": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "ivfpq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "hnsw": [{"ef_search": e} for e in (16, 32, 64, 128)],
+}
+
+
+def synthetic_vectors(count, dim, queries, seed=0):
+    """Gaussian clusters, so IVF lists and HNSW neighbourhoods look like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 200), dim)).astype(np.float32)
+
+    def sample(n):
+        return centers[rng.integers(len(centers), size=n)] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+    return sample(count), sample(queries)
+
+
+def catalog_vectors(file_path, scale, queries, seed=0):
+    """Hashing embeddings of title-level documents, with held-out titles as queries."""
+    from embedding_backends import HashingEmbeddings
+    from parse_book_entries import iter_records
+
+    records = list(iter_records(file_path))
+    texts = [
+        f"{title} - {record.collection} #{copy} ({record.grade})"
+        for copy in range(scale)
+        for record in records
+        for title in record.titles
+    ]
+    embeddings = HashingEmbeddings()
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    picks = np.random.default_rng(seed).choice(len(texts), min(queries, len(texts)), replace=False)
+    query_vectors = np.array(embeddings.embed_documents([texts[i].split(" - ")[0] for i in picks]), dtype=np.float32)
+    return vectors, query_vectors
+
+
+def timed_search(index, queries, k, params=None):
+    """Top-k labels, searching one query at a time like a live request."""
+    labels = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, labels[i:i + 1] = index.search(queries[i:i + 1], k, params=params)
+    return labels, (time.perf_counter() - start) / len(queries)
+
+
+def recall(labels, queries, vectors, kth):
+    """
+    Fraction of returned ids at least as close (exact L2) as the true k-th
+    neighbour, so near-duplicate documents tied with it count as hits.
+    """
+    hits = 0
+    for query, row, limit in zip(queries, labels, kth):
+        row = row[row >= 0]
+        distances = ((vectors[row] - query) ** 2).sum(axis=1)
+        hits += np.count_nonzero(distances <= limit * (1 + 1e-5) + 1e-6)
+    return hits / labels.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", choices=("synthetic", "catalog"), default="synthetic")
+    parser.add_argument("--count", type=int, default=200000, help="synthetic vectors")
+    parser.add_argument("--dim", type=int, default=256, help="synthetic dimensions")
+    parser.add_argument("--scale", type=int, default=100, help="catalog copies")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.source == "catalog":
+        vectors, queries = catalog_vectors("data/book_entries.txt", args.scale, args.queries)
+    else:
+        vectors, queries = synthetic_vectors(args.count, args.dim, args.queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k}\n")
+    print(f"{'index':<22}{'setting':<14}{'build s':>9}{'MiB':>9}{'recall':>8}{'ms/query':>10}")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    kth = exact.search(queries, args.k)[0][:, -1]
+
+    for index_type, sweep in SWEEPS.items():
+        config = IndexConfig(type=index_type)
+        start = time.perf_counter()
+        index = build_index(config, vectors)
+        index.add(vectors)
+        build = time.perf_counter() - start
+        size = len(faiss.serialize_index(index)) / 2**20
+        name = factory_string(config, vectors.shape[1], len(vectors))
+
+        for setting in sweep:
+            tune_index(index, config._replace(**setting))
+            labels, latency = timed_search(index, queries, args.k, search_parameters(index))
+            label = ", ".join(f"{k}={v}" for k, v in setting.items()) or "exact"
+            print(f"{name:<22}{label:<14}{build:>9.2f}{size:>9.1f}{recall(labels, queries, vectors, kth):>8.3f}{latency * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Recall and per-query latency of the three retrieval modes (vector, hybrid,
+lexical) over the book catalog.
+
+    python benchmarks/retrieval_modes.py [--queries N] [--k K] [--embeddings hashing]
+
+Queries are generated from the catalog itself: every book title and every
+collection name, with the records that contain it as the relevant set. With
+the openai backend the vector and hybrid modes need OPENAI_API_KEY (document
+embeddings come from the embedding cache); without it only the lexical mode
+is measured. The hashing backend runs everything locally.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from embedding_backends import BACKENDS, make_embeddings  # noqa: E402
+from index_store import load_or_build_index  # noqa: E402
+from langchain_helper import book_documents, catalog_retriever  # noqa: E402
+from parse_book_entries import iter_records  # noqa: E402
+from record_index import record_id  # noqa: E402
+
+
+def catalog_queries(file_path):
+    """[(query, {relevant record ids}), ...] from book titles and collection names."""
+    relevant = {}
+    seen = {}
+    for record in iter_records(file_path):
+        rid = record_id(record.collection, record.grade, seen)
+        relevant.setdefault(record.collection, set()).add(rid)
+        for title in record.titles:
+            relevant.setdefault(title, set()).add(rid)
+    return sorted(relevant.items())
+
+
+def measure(retriever, queries, k):
+    recalls, latencies = [], []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append(time.perf_counter() - start)
+        found = {d.metadata["record_id"] for d in docs[:k]}
+        recalls.append(len(found & relevant) / min(k, len(relevant)))
+    return statistics.mean(recalls), latencies
+
+
+def embeddings_backend(backend):
+    """Embeddings used for the dense modes, or None if OpenAI is asked for without a key."""
+    if backend == "openai" and not os.getenv("OPENAI_API_KEY"):
+        return None
+    return make_embeddings(backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--file", default="data/book_entries.txt")
+    parser.add_argument("--queries", type=int, default=200, help="sample size (0 = every query)")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embeddings", choices=BACKENDS, default=None,
+                        help="embedding backend (default: $EMBEDDINGS_BACKEND, else openai)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    queries = catalog_queries(args.file)
+    if args.queries and args.queries < len(queries):
+        queries = random.Random(0).sample(queries, args.queries)
+
+    embeddings = embeddings_backend(args.embeddings or os.getenv("EMBEDDINGS_BACKEND", "openai"))
+    modes = ("vector", "hybrid", "lexical")
+    if embeddings is None:
+        print("OPENAI_API_KEY not set (try --embeddings hashing): measuring the lexical mode only")
+        from langchain_community.embeddings import FakeEmbeddings
+        embeddings, modes = FakeEmbeddings(size=8), ("lexical",)
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        db = load_or_build_index(args.file, book_documents, embeddings, store_dir=store_dir)
+        print(f"{len(queries)} queries over {db.index.ntotal} records, recall@{args.k}\n")
+        print(f"{'mode':<10}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        for mode in modes:
+            recall, latencies = measure(catalog_retriever(db, mode, k=args.k), queries, args.k)
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000
+            print(f"{mode:<10}{recall:>8.3f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
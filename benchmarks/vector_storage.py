@@ -0,0 +1,94 @@
+"""
+Memory and recall per vector storage mode (float32, float16, int8 scalar
+quantised, PQ), with and without re-ranking the top candidates against the
+full-precision vectors kept on disk.
+
+    python benchmarks/vector_storage.py [--count N] [--dim D] [--index flat|ivf|hnsw] [--rerank R]
+    python benchmarks/vector_storage.py --source catalog --scale 100
+
+"MiB" is the in-memory index each worker holds; the float32 copy used for
+re-ranking is mmapped from disk, so only the pages of candidate rows are
+read, and they sit in the page cache that every worker on the box shares.
+Recall@k is tie-tolerant, against exact float32 search. Sources are the
+same as benchmarks/index_types.py; --dim defaults to the 1536 dimensions
+of OpenAI embeddings.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from index_store import (  # noqa: E402
+    STORAGE_TYPES,
+    IndexConfig,
+    build_index,
+    factory_string,
+    rerank,
+    search_parameters,
+)
+from index_types import catalog_vectors, recall, synthetic_vectors  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", choices=("synthetic", "catalog"), default="synthetic")
+    parser.add_argument("--count", type=int, default=50000, help="synthetic vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="synthetic dimensions")
+    parser.add_argument("--scale", type=int, default=100, help="catalog copies")
+    parser.add_argument("--index", choices=("flat", "ivf", "hnsw"), default="flat")
+    parser.add_argument("--pq-m", type=int, default=IndexConfig().pq_m)
+    parser.add_argument("--rerank", type=int, default=IndexConfig().rerank, help="candidates fetched per result")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.source == "catalog":
+        vectors, queries = catalog_vectors("data/book_entries.txt", args.scale, args.queries)
+    else:
+        vectors, queries = synthetic_vectors(args.count, args.dim, args.queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k}, "
+          f"re-rank x{args.rerank}\n")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    kth = exact.search(queries, args.k)[0][:, -1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # the full-precision copy, read back as a memmap like index_store does
+        path = os.path.join(tmp, "vectors.npy")
+        np.save(path, vectors)
+        full_vectors = np.load(path, mmap_mode="r")
+        print(f"float32 vectors on disk for re-ranking: {os.path.getsize(path) / 2**20:.1f} MiB\n")
+
+        print(f"{'storage':<10}{'index':<22}{'MiB':>9}{'vs f32':>8}{'recall':>8}{'reranked':>10}{'ms/query':>10}")
+        baseline = None
+        for storage in STORAGE_TYPES:
+            config = IndexConfig(type=args.index, storage=storage, pq_m=args.pq_m)
+            index = build_index(config, vectors)
+            index.add(vectors)
+            size = len(faiss.serialize_index(index)) / 2**20
+            baseline = baseline or size
+            params = search_parameters(index)
+
+            plain = index.search(queries, args.k, params=params)[1]
+            reranked = np.full((len(queries), args.k), -1, dtype=np.int64)
+            start = time.perf_counter()
+            for i, query in enumerate(queries):
+                _, candidates = index.search(query[None, :], args.k * args.rerank, params=params)
+                hits = rerank(full_vectors, query, [int(c) for c in candidates[0] if c != -1], args.k)
+                reranked[i, :len(hits)] = hits
+            latency = (time.perf_counter() - start) / len(queries)
+
+            print(f"{storage:<10}{factory_string(config, vectors.shape[1], len(vectors)):<22}{size:>9.1f}"
+                  f"{baseline / size:>7.1f}x{recall(plain, queries, vectors, kth):>8.3f}"
+                  f"{recall(reranked, queries, vectors, kth):>10.3f}{latency * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
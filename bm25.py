@@ -0,0 +1,90 @@
+import numpy as np
+
+from title_index import fold_text
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens (same folding as the title index)."""
+    return fold_text(text or "").split()
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several best-first lists of ids: each id scores sum(1 / (k + rank)),
+    rank starting at 1. Returns ids best first; ties keep first-seen order.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of texts, stored as CSR-style postings
+    arrays: the postings of term t are doc_ids[indptr[t]:indptr[t + 1]]
+    with their precomputed BM25 weights in weights[...]. Scoring a query is
+    one vectorised add per query term.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        vocab = {}
+        postings = []             # term id -> {doc: term frequency}
+        lengths = []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                term = vocab.setdefault(token, len(vocab))
+                if term == len(postings):
+                    postings.append({})
+                postings[term][doc] = postings[term].get(doc, 0) + 1
+
+        self.vocab = vocab
+        self.doc_count = len(lengths)
+        self.doc_lengths = np.array(lengths, dtype=np.float32)
+        average = float(self.doc_lengths.mean()) if self.doc_count else 0.0
+
+        self.indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(p) for p in postings])
+        self.doc_ids = np.empty(self.indptr[-1], dtype=np.int32)
+        tfs = np.empty(self.indptr[-1], dtype=np.float32)
+        for term, docs in enumerate(postings):
+            start = self.indptr[term]
+            self.doc_ids[start:start + len(docs)] = list(docs)
+            tfs[start:start + len(docs)] = list(docs.values())
+
+        df = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((self.doc_count - df + 0.5) / (df + 0.5))
+
+        norm = k1 * (1 - b + b * self.doc_lengths[self.doc_ids] / average) if average else k1
+        term_of = np.repeat(np.arange(len(postings)), np.diff(self.indptr))
+        self.weights = (self.idf[term_of] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def __len__(self):
+        return self.doc_count
+
+    def scores(self, query):
+        """BM25 score of every document for `query` (0 where no term matches)."""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is not None:
+                start, end = self.indptr[term], self.indptr[term + 1]
+                scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, k=4, ids=None):
+        """Best-first document indices matching `query`, optionally only among `ids`."""
+        if k <= 0:
+            return []
+        scores = self.scores(query)
+        if ids is not None:
+            allowed = np.zeros(self.doc_count, dtype=bool)
+            allowed[np.asarray(ids, dtype=np.intp)] = True
+            scores[~allowed] = 0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        return [int(i) for i in hits[np.lexsort((hits, -scores[hits]))]]
@@ -0,0 +1,223 @@
+import hashlib
+import os
+import threading
+
+import catalog_snapshot
+from catalog_db import CatalogDB
+from catalog_delta import CatalogReloader
+from individuals import IndividualCatalog
+from parse_book_entries import CollectionEntry, collections_from_records, iter_individuals
+from price_matrix import PriceMatrix
+from record_index import get_record_index
+from title_index import TitleIndex
+
+# (kind, abs path) -> (mtime_ns, size, sha256 or None for snapshots, value); shared by every session in the process
+_catalogs = {}
+_lock = threading.Lock()
+# abs path -> CatalogReloader, the per-record state incremental reloads diff against
+_reloaders = {}
+# CatalogDB shared by every load_catalog_db() call (see _catalog_db)
+_shared_db = None
+# abs path -> ((individuals, collections, title index), linked IndividualCatalog)
+_linked = {}
+
+
+def file_sha256(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _freeze(collections):
+    """Read-only, compact copy of parse_book_entries() output, safe to share between sessions."""
+    return tuple(CollectionEntry(c["collection"], c["grades"]) for c in collections)
+
+
+def _reloader(path):
+    """The CatalogReloader for `path`, brought up to date with the file."""
+    reloader = _reloaders.get(path)
+    if reloader is None:
+        reloader = _reloaders[path] = CatalogReloader(path)
+    reloader.reload()
+    return reloader
+
+
+def _load(kind, file_path, from_text, from_snapshot, apply_delta=None):
+    """
+    Build `kind` from file_path once per process and return the same object
+    until the file changes.
+
+    A stat() check (mtime and size) decides whether the file may have
+    changed; if it did, the content hash decides whether to rebuild, so a
+    touched-but-identical file is not parsed again.
+
+    If a compiled snapshot (see catalog_snapshot.py) records this very file
+    at its current size and mtime, it is built from the mmapped snapshot
+    instead and nothing is parsed.
+
+    With `apply_delta`, the text is read through a shared CatalogReloader:
+    `from_text` and `apply_delta` get the reloader instead of the path, and
+    an edit only costs applying the changed records to the previous value.
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+
+    # compiled snapshots live next to the text they were built from
+    snapshot_path = os.path.join(os.path.dirname(path), os.path.basename(catalog_snapshot.SNAPSHOT_PATH))
+    if catalog_snapshot.is_fresh(snapshot_path, (path,)):
+        snap_stat = os.stat(snapshot_path)
+        with _lock:
+            cached = _catalogs.get((kind, snapshot_path))
+            if cached and cached[0] == snap_stat.st_mtime_ns and cached[1] == snap_stat.st_size:
+                return cached[3]
+            value = from_snapshot(catalog_snapshot.CatalogSnapshot(snapshot_path))
+            _catalogs[(kind, snapshot_path)] = (snap_stat.st_mtime_ns, snap_stat.st_size, None, value)
+            return value
+
+    with _lock:
+        cached = _catalogs.get((kind, path))
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[3]
+
+        if apply_delta is None:
+            digest = file_sha256(path)
+            if cached and cached[2] == digest:
+                value = cached[3]
+            else:
+                value = from_text(path)
+        else:
+            reloader = _reloader(path)
+            digest = reloader.digest
+            if cached and cached[2] == digest:
+                value = cached[3]
+            elif cached and cached[2] == reloader.previous_digest:
+                value = apply_delta(cached[3], reloader)
+            else:
+                value = from_text(reloader)
+
+        _catalogs[(kind, path)] = (stat.st_mtime_ns, stat.st_size, digest, value)
+        return value
+
+
+def catalog_version(file_path="data/book_entries.txt"):
+    """
+    sha256 of the catalog text, cheap enough to call on every rerun: the
+    digest _load already keeps for the file is reused while a stat() shows
+    it unchanged, and the file is only hashed again when it may have changed.
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    with _lock:
+        for (kind, cached_path), cached in _catalogs.items():
+            if cached_path == path and cached[2] and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached[2]
+        digest = file_sha256(path)
+        _catalogs[("version", path)] = (stat.st_mtime_ns, stat.st_size, digest, digest)
+        return digest
+
+
+def load_catalog(file_path="data/book_entries.txt"):
+    """
+    parse_book_entries(file_path) as a shared, immutable object, parsed once
+    per process; when the file changes only the edited records are re-parsed
+    and re-folded (see _load).
+    """
+    return _load(
+        "collections",
+        file_path,
+        lambda reloader: _freeze(collections_from_records(reloader.records.values())),
+        lambda snapshot: snapshot.collections(),
+        _update_collections,
+    )
+
+
+def _update_collections(collections, reloader):
+    """Re-fold only the collections touched by the reloader's last delta."""
+    touched = reloader.touched_collections()
+    previous = {c["collection"]: c for c in collections}
+    names = dict.fromkeys(r.collection for r in reloader.records.values())
+    return tuple(
+        _freeze(collections_from_records(r for r in reloader.records.values() if r.collection == name))[0]
+        if name in touched or name not in previous else previous[name]
+        for name in names
+    )
+
+
+def load_price_matrix(file_path="data/book_entries.txt"):
+    """Shared PriceMatrix of the catalog, rebuilt only when the file changes."""
+    return _load(
+        "prices",
+        file_path,
+        lambda reloader: PriceMatrix.from_records(reloader.records.values()),
+        PriceMatrix.from_snapshot,
+        lambda matrix, reloader: matrix.updated(reloader.records.values(), reloader.touched_collections()),
+    )
+
+
+def load_title_index(file_path="data/book_entries.txt"):
+    """Shared TitleIndex of the catalog, rebuilt only when the file changes."""
+    return _load(
+        "titles",
+        file_path,
+        lambda reloader: TitleIndex.from_records(reloader.records.values()),
+        lambda snapshot: TitleIndex.from_records(snapshot.records()),
+        lambda index, reloader: index.updated(*reloader.touched_records()),
+    )
+
+
+def load_individuals(file_path="data/indivuals.txt", catalog_path="data/book_entries.txt"):
+    """
+    Shared IndividualCatalog (author and title indexes), rebuilt only when the
+    file changes, with its listings linked to the collections and titles of
+    `catalog_path` (relinked only when either side is reloaded).
+    """
+    individuals = _load(
+        "individuals",
+        file_path,
+        lambda path: IndividualCatalog.from_records(iter_individuals(path)),
+        lambda snapshot: IndividualCatalog.from_records(snapshot.individuals()),
+    )
+    sources = (individuals, load_catalog(catalog_path), load_title_index(catalog_path))
+    with _lock:
+        cached = _linked.get(os.path.abspath(file_path))
+        if cached and all(a is b for a, b in zip(cached[0], sources)):
+            return cached[1]
+        linked = individuals.linked(*sources[1:])
+        _linked[os.path.abspath(file_path)] = (sources, linked)
+        return linked
+
+
+def load_record_index(file_path="data/book_entries.txt"):
+    """Shared byte-offset RecordIndex; full records are decoded only when viewed."""
+    return get_record_index(file_path)
+
+
+def _catalog_db():
+    """The process's one CatalogDB connection, re-synced in place on every change."""
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = CatalogDB()
+    return _shared_db
+
+
+def _snapshot_version(snapshot):
+    stat = os.stat(snapshot.path)
+    return f"snapshot:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def load_catalog_db(file_path="data/book_entries.txt"):
+    """
+    Shared SQLite/FTS5 CatalogDB of the catalog, re-synced only when the file
+    changes. The stored version is the digest the reloader already has (or
+    the snapshot's mtime and size), so a worker starting on an unchanged
+    catalog leaves the database as it is.
+    """
+    return _load(
+        "sqlite",
+        file_path,
+        lambda reloader: _catalog_db().sync(reloader.records.values(), reloader.digest),
+        lambda snapshot: _catalog_db().sync(snapshot.records(), _snapshot_version(snapshot)),
+        lambda db, reloader: db.sync(reloader.records.values(), reloader.digest),
+    )
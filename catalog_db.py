@@ -0,0 +1,189 @@
+"""
+Optional SQLite backend for the catalog, with an FTS5 index for ranked
+keyword search that needs no network call.
+
+Tables:
+
+    collections      id, name
+    offerings        id, collection_id, grade, record_id, description
+    prices           offering_id, list_price, price, savings (cents)
+    titles           id, title
+    offering_titles  offering_id, title_id, position
+    catalog_fts      FTS5 over collection, grade, description and titles,
+                     rowid = offerings.id
+"""
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from record_index import record_id
+
+DB_PATH = os.path.join("data", ".catalog.sqlite3")
+
+SearchHit = namedtuple("SearchHit", "record_id collection grade price score snippet")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS offerings (
+    id INTEGER PRIMARY KEY,
+    collection_id INTEGER NOT NULL REFERENCES collections (id),
+    grade TEXT,
+    record_id TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS offerings_collection ON offerings (collection_id);
+CREATE TABLE IF NOT EXISTS prices (
+    offering_id INTEGER PRIMARY KEY REFERENCES offerings (id),
+    list_price INTEGER,
+    price INTEGER,
+    savings TEXT);
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS offering_titles (
+    offering_id INTEGER NOT NULL REFERENCES offerings (id),
+    title_id INTEGER NOT NULL REFERENCES titles (id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (offering_id, position));
+CREATE INDEX IF NOT EXISTS offering_titles_title ON offering_titles (title_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+    collection, grade, description, titles,
+    tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+# bm25 column weights: collection, grade, description, titles
+_WEIGHTS = (5.0, 1.0, 1.0, 2.0)
+
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for free text: every word must match, quoted so
+    punctuation ("C3", "K-2") is literal; the last word also matches as a
+    prefix so results update while typing.
+    """
+    words = ['"' + w.replace('"', '""') + '"' for w in text.split()]
+    if not words:
+        return None
+    words[-1] += "*"
+    return " ".join(words)
+
+
+class CatalogDB:
+    """The parsed catalog in normalised SQLite tables plus an FTS5 index."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # one connection shared by every session; sqlite serialises the writes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def version(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    def sync(self, records, version=None):
+        """
+        Replace the contents with `records` (BookRecords in file order) unless
+        the stored `version` already matches. Returns self.
+        """
+        if version is not None and self.version() == version:
+            return self
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version is not None:
+                    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                    if row and row[0] == version:
+                        # another worker synced the same version first
+                        conn.execute("COMMIT")
+                        return self
+                for table in ("catalog_fts", "offering_titles", "titles", "prices", "offerings", "collections"):
+                    conn.execute(f"DELETE FROM {table}")
+
+                collection_ids, title_ids, seen = {}, {}, {}
+                for record in records:
+                    if record.collection not in collection_ids:
+                        collection_ids[record.collection] = conn.execute(
+                            "INSERT INTO collections (name) VALUES (?)", (record.collection,)).lastrowid
+                    offering_id = conn.execute(
+                        "INSERT INTO offerings (collection_id, grade, record_id, description) VALUES (?, ?, ?, ?)",
+                        (collection_ids[record.collection], record.grade,
+                         record_id(record.collection, record.grade, seen), record.description),
+                    ).lastrowid
+                    conn.execute(
+                        "INSERT INTO prices (offering_id, list_price, price, savings) VALUES (?, ?, ?, ?)",
+                        (offering_id, record.list_price, record.price, record.savings),
+                    )
+                    for position, title in enumerate(record.titles):
+                        if title not in title_ids:
+                            title_ids[title] = conn.execute(
+                                "INSERT INTO titles (title) VALUES (?)", (title,)).lastrowid
+                        conn.execute(
+                            "INSERT OR IGNORE INTO offering_titles (offering_id, title_id, position) VALUES (?, ?, ?)",
+                            (offering_id, title_ids[title], position),
+                        )
+                    conn.execute(
+                        "INSERT INTO catalog_fts (rowid, collection, grade, description, titles) VALUES (?, ?, ?, ?, ?)",
+                        (offering_id, record.collection, record.grade or "",
+                         record.description, "\n".join(record.titles)),
+                    )
+
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version or "",))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self
+
+    def search(self, text, limit=10):
+        """Offerings matching every word of `text`, best bm25 match first, as SearchHits."""
+        query = fts_query(text)
+        if query is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT o.record_id, c.name, o.grade, p.price,"
+                " bm25(catalog_fts, ?, ?, ?, ?) AS score,"
+                " snippet(catalog_fts, -1, '**', '**', '…', 12)"
+                " FROM catalog_fts"
+                " JOIN offerings o ON o.id = catalog_fts.rowid"
+                " JOIN collections c ON c.id = o.collection_id"
+                " LEFT JOIN prices p ON p.offering_id = o.id"
+                " WHERE catalog_fts MATCH ?"
+                " ORDER BY score LIMIT ?",
+                (*_WEIGHTS, query, limit),
+            ).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def offerings(self, collection):
+        """[(grade, price in cents), ...] for one collection, in catalog order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT o.grade, p.price FROM offerings o"
+                " JOIN collections c ON c.id = o.collection_id"
+                " LEFT JOIN prices p ON p.offering_id = o.id"
+                " WHERE c.name = ? ORDER BY o.id",
+                (collection,),
+            ).fetchall()
+
+    def titles(self, rid):
+        """Book titles of one offering, in catalog order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.title FROM offering_titles ot"
+                " JOIN offerings o ON o.id = ot.offering_id"
+                " JOIN titles t ON t.id = ot.title_id"
+                " WHERE o.record_id = ? ORDER BY ot.position",
+                (rid,),
+            ).fetchall()
+        return [title for title, in rows]
@@ -0,0 +1,94 @@
+"""
+Per-record diffs of data/book_entries.txt.
+
+Every `---` block is hashed; reloading the file compares those hashes with
+the previous version and reports which record ids were added, changed or
+removed. Only those blocks are parsed again, and the loaders in catalog.py
+and index_store.py apply the same delta to what they already hold instead
+of rebuilding from scratch.
+"""
+import hashlib
+from collections import namedtuple
+
+from record_index import decode_block, iter_blocks, record_id
+
+CatalogDelta = namedtuple("CatalogDelta", "added changed removed")
+
+
+def block_hash(block):
+    return hashlib.sha256(block).hexdigest()
+
+
+def diff_hashes(old, new):
+    """CatalogDelta of record ids between two {id: hash} maps (ids in file order)."""
+    return CatalogDelta(
+        added=[rid for rid in new if rid not in old],
+        changed=[rid for rid in new if rid in old and old[rid] != new[rid]],
+        removed=[rid for rid in old if rid not in new],
+    )
+
+
+class CatalogReloader:
+    """
+    The parsed records of one catalog file, kept current by re-parsing only
+    the blocks whose hash changed since the last reload().
+
+    After a reload that changed the file, `delta` holds the ids that moved
+    from `previous_digest` to `digest`, and `replaced` the old BookRecord of
+    every changed or removed id.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.digest = None
+        self.previous_digest = None
+        self.hashes = {}          # record id -> block hash, in file order
+        self.records = {}         # record id -> BookRecord, in file order
+        self.delta = None
+        self.replaced = {}
+
+    def reload(self):
+        """Bring the records up to date with the file; returns the delta (None if unchanged)."""
+        with open(self.file_path, "rb") as f:
+            buf = f.read()
+        digest = hashlib.sha256(buf).hexdigest()
+        if digest == self.digest:
+            return None
+
+        # unchanged blocks keep their parsed record, even if they moved
+        known = {h: self.records[rid] for rid, h in self.hashes.items()}
+        seen = {}
+        hashes, records = {}, {}
+        for offset, length in iter_blocks(buf):
+            h = block_hash(buf[offset:offset + length])
+            record = known.get(h) or decode_block(buf, offset, length)
+            if record is None:
+                continue
+            rid = record_id(record.collection, record.grade, seen)
+            hashes[rid] = h
+            records[rid] = record
+
+        delta = diff_hashes(self.hashes, hashes)
+        self.replaced = {rid: self.records[rid] for rid in delta.changed + delta.removed}
+        self.previous_digest, self.digest = self.digest, digest
+        self.hashes, self.records, self.delta = hashes, records, delta
+        return delta
+
+    def touched_collections(self):
+        """Names of every collection with a record in the last delta."""
+        names = {r.collection for r in self.replaced.values()}
+        names.update(self.records[rid].collection for rid in self.delta.added + self.delta.changed)
+        return names
+
+    def touched_records(self):
+        """
+        (old, new) records for the last delta. `new` also holds unchanged
+        records that share a (collection, grade) with a touched one, since
+        indexes keyed on that pair must see all of them again.
+        """
+        old = list(self.replaced.values())
+        pairs = {(r.collection, r.grade) for r in old}
+        pairs.update((self.records[rid].collection, self.records[rid].grade)
+                     for rid in self.delta.added + self.delta.changed)
+        new = [r for r in self.records.values() if (r.collection, r.grade) in pairs]
+        return old, new
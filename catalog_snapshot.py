@@ -0,0 +1,303 @@
+"""
+Compiled binary snapshot of the catalog, so workers can start without
+parsing the text files.
+
+    python catalog_snapshot.py        # writes data/catalog.snapshot
+    python catalog_snapshot.py BOOKS [INDIVIDUALS] [OUT]   # OUT defaults to catalog.snapshot next to BOOKS
+
+Layout (all integers little-endian int64, every section 8-byte aligned):
+
+    header      magic, format version, then (offset, count) per section
+    str_offsets count + 1 offsets into str_blob; string i is blob[off[i]:off[i+1]]
+    str_blob    UTF-8 bytes of every distinct string
+    books       8 ints per record: collection, grade, list_price, price,
+                savings, description, first title, title count
+    titles      string id per book title, grouped by record
+    collections 3 ints per collection: name, first offering, offering count
+    offerings   2 ints per (collection, grade): grade, price
+    individuals 4 ints per individual title: grade, collection, title, author
+    sources     3 ints per text file it was built from: absolute path,
+                size, mtime_ns
+
+String fields hold string ids and prices hold cents; -1 means missing.
+Loading mmaps the file and casts each section to a memoryview, so nothing is
+copied or decoded until it is read. A snapshot is only used for a text file
+it records with the same size and mtime (see is_fresh).
+"""
+import mmap
+import os
+import struct
+import sys
+
+from parse_book_entries import (
+    BookRecord,
+    CollectionEntry,
+    IndividualRecord,
+    format_price,
+    iter_individuals,
+    iter_records,
+)
+
+SNAPSHOT_PATH = os.path.join("data", "catalog.snapshot")
+MAGIC = b"BOOKCAT\0"
+FORMAT_VERSION = 2
+
+SECTIONS = ("str_offsets", "str_blob", "books", "titles", "collections", "offerings", "individuals", "sources")
+BOOK_FIELDS = 8
+COLLECTION_FIELDS = 3
+OFFERING_FIELDS = 2
+INDIVIDUAL_FIELDS = 4
+SOURCE_FIELDS = 3
+
+_HEADER = struct.Struct("<8sq" + "qq" * len(SECTIONS))
+
+
+def _pad(n):
+    return (n + 7) & ~7
+
+
+def _source_key(path):
+    """(size, mtime_ns) of a source file, as recorded in the sources section."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def compile_catalog(book_path="data/book_entries.txt",
+                    individuals_path="data/indivuals.txt",
+                    out_path=SNAPSHOT_PATH):
+    """Parse both text files and write them to `out_path` as a snapshot."""
+    strings = {}
+
+    def sid(text):
+        if text is None:
+            return -1
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    def cents(value):
+        return -1 if value is None else value
+
+    # stat before parsing, so an edit made while compiling leaves the snapshot stale
+    sources = []
+    for path in (book_path, individuals_path):
+        if path and os.path.exists(path):
+            sources += [sid(os.path.abspath(path)), *_source_key(path)]
+
+    books, titles = [], []
+    collections = {}          # name -> {grade: price}, first name wins, grades merged
+    for record in iter_records(book_path):
+        books += [
+            sid(record.collection), sid(record.grade),
+            cents(record.list_price), cents(record.price),
+            sid(record.savings), sid(record.description),
+            len(titles), len(record.titles),
+        ]
+        titles += [sid(t) for t in record.titles]
+
+        grades = collections.setdefault(record.collection, {})
+        if record.grade and record.price is not None:
+            grades[record.grade] = record.price
+
+    collection_rows, offerings = [], []
+    for name, grades in collections.items():
+        collection_rows += [sid(name), len(offerings) // OFFERING_FIELDS, len(grades)]
+        for grade, price in grades.items():
+            offerings += [sid(grade), price]
+
+    individuals = []
+    if individuals_path and os.path.exists(individuals_path):
+        for record in iter_individuals(individuals_path):
+            individuals += [sid(record.grade), sid(record.collection), sid(record.title), sid(record.author)]
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+
+    payloads = {
+        "str_offsets": (struct.pack(f"<{len(offsets)}q", *offsets), len(encoded)),
+        "str_blob": (b"".join(encoded), offsets[-1]),
+        "books": (struct.pack(f"<{len(books)}q", *books), len(books) // BOOK_FIELDS),
+        "titles": (struct.pack(f"<{len(titles)}q", *titles), len(titles)),
+        "collections": (struct.pack(f"<{len(collection_rows)}q", *collection_rows), len(collections)),
+        "offerings": (struct.pack(f"<{len(offerings)}q", *offerings), len(offerings) // OFFERING_FIELDS),
+        "individuals": (struct.pack(f"<{len(individuals)}q", *individuals), len(individuals) // INDIVIDUAL_FIELDS),
+        "sources": (struct.pack(f"<{len(sources)}q", *sources), len(sources) // SOURCE_FIELDS),
+    }
+
+    table = []
+    position = _HEADER.size
+    for name in SECTIONS:
+        data, count = payloads[name]
+        table += [position, count]
+        position = _pad(position + len(data))
+
+    tmp_path = f"{out_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, *table))
+        for name in SECTIONS:
+            data, _ = payloads[name]
+            f.write(data)
+            f.write(b"\0" * (_pad(len(data)) - len(data)))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class CatalogSnapshot:
+    """Read-only, mmap-backed view of a compiled catalog snapshot."""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+
+        magic, version, *table = _HEADER.unpack_from(buf)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} catalog snapshot")
+
+        sections = dict(zip(SECTIONS, zip(table[0::2], table[1::2])))
+        widths = {
+            "str_offsets": 1, "books": BOOK_FIELDS, "titles": 1,
+            "collections": COLLECTION_FIELDS, "offerings": OFFERING_FIELDS,
+            "individuals": INDIVIDUAL_FIELDS, "sources": SOURCE_FIELDS,
+        }
+
+        def ints(name, extra=0):
+            offset, count = sections[name]
+            return buf[offset:offset + 8 * (count * widths[name] + extra)].cast("q")
+
+        blob_offset, blob_size = sections["str_blob"]
+        self._blob = buf[blob_offset:blob_offset + blob_size]
+        self._str_offsets = ints("str_offsets", extra=1)
+        self._books = ints("books")
+        self._titles = ints("titles")
+        self._collections = ints("collections")
+        self._offerings = ints("offerings")
+        self._individuals = ints("individuals")
+        self._sources = ints("sources")
+
+        self.book_count = sections["books"][1]
+        self.collection_count = sections["collections"][1]
+        self.individual_count = sections["individuals"][1]
+
+        # zero-copy integer columns (-1 = missing): per record its grade string id
+        # and "Your Price" cents; per collection its name string id and offering
+        # count; per offering (grouped by collection) its grade string id and cents
+        self.grade_ids = self._books[1::BOOK_FIELDS]
+        self.prices = self._books[3::BOOK_FIELDS]
+        self.collection_name_ids = self._collections[0::COLLECTION_FIELDS]
+        self.offering_counts = self._collections[2::COLLECTION_FIELDS]
+        self.offering_grade_ids = self._offerings[0::OFFERING_FIELDS]
+        self.offering_prices = self._offerings[1::OFFERING_FIELDS]
+
+    def sources(self):
+        """{absolute path: (size, mtime_ns)} of the text files the snapshot was built from."""
+        rows = self._sources
+        return {
+            self.string(rows[i]): (rows[i + 1], rows[i + 2])
+            for i in range(0, len(rows), SOURCE_FIELDS)
+        }
+
+    def string(self, i):
+        if i < 0:
+            return None
+        return str(self._blob[self._str_offsets[i]:self._str_offsets[i + 1]], "utf-8")
+
+    def record(self, i):
+        """Decode book record `i` into a BookRecord."""
+        row = self._books[i * BOOK_FIELDS:(i + 1) * BOOK_FIELDS]
+        first, count = row[6], row[7]
+        return BookRecord(
+            collection=self.string(row[0]),
+            grade=self.string(row[1]),
+            list_price=None if row[2] < 0 else row[2],
+            price=None if row[3] < 0 else row[3],
+            savings=self.string(row[4]),
+            description=self.string(row[5]) or "",
+            titles=tuple(self.string(t) for t in self._titles[first:first + count]),
+        )
+
+    def records(self):
+        for i in range(self.book_count):
+            yield self.record(i)
+
+    def individual(self, i):
+        row = self._individuals[i * INDIVIDUAL_FIELDS:(i + 1) * INDIVIDUAL_FIELDS]
+        return IndividualRecord(
+            grade=self.string(row[0]),
+            collection=self.string(row[1]),
+            title=self.string(row[2]),
+            author=self.string(row[3]),
+        )
+
+    def individuals(self):
+        for i in range(self.individual_count):
+            yield self.individual(i)
+
+    def collection(self, i):
+        """Entry `i` in the same shape as parse_book_entries() returns."""
+        name, first, count = self._collections[i * COLLECTION_FIELDS:(i + 1) * COLLECTION_FIELDS]
+        grades = {}
+        for j in range(first, first + count):
+            grade, price = self._offerings[j * OFFERING_FIELDS:(j + 1) * OFFERING_FIELDS]
+            grades[self.string(grade)] = format_price(price)
+        return CollectionEntry(self.string(name), grades)
+
+    def collections(self):
+        """Lazy, read-only sequence of collection entries (decoded on access)."""
+        return SnapshotCollections(self)
+
+
+class SnapshotCollections:
+    """Sequence view used in place of the parse_book_entries() list."""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return self._snapshot.collection_count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._snapshot.collection(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._snapshot.collection(i)
+
+
+def is_fresh(snapshot_path=SNAPSHOT_PATH, sources=("data/book_entries.txt", "data/indivuals.txt")):
+    """
+    True if the snapshot was built from every existing file in `sources`, as
+    it is now: same absolute path, size and mtime. A snapshot of another
+    file, or of an older copy restored with its old mtime, is not fresh.
+    """
+    try:
+        recorded = CatalogSnapshot(snapshot_path).sources()
+    except (OSError, ValueError, struct.error):
+        return False
+    return all(
+        recorded.get(os.path.abspath(src)) == _source_key(src)
+        for src in sources if os.path.exists(src)
+    )
+
+
+if __name__ == "__main__":
+    book_path, individuals_path, out_path = (sys.argv[1:4] + [None] * 3)[:3]
+    book_path = book_path or "data/book_entries.txt"
+    out = compile_catalog(
+        book_path,
+        individuals_path or "data/indivuals.txt",
+        # next to the text it was built from, which is where catalog.py looks for it
+        out_path or os.path.join(os.path.dirname(book_path), os.path.basename(SNAPSHOT_PATH)),
+    )
+    snapshot = CatalogSnapshot(out)
+    print(f"Wrote {out}: {snapshot.book_count} records, {snapshot.collection_count} collections, "
+          f"{snapshot.individual_count} individual titles")
@@ -0,0 +1,82 @@
+"""
+Embedding backends, chosen with the EMBEDDINGS_BACKEND environment variable:
+
+    openai   OpenAIEmbeddings behind the local embedding cache (default)
+    hashing  HashingEmbeddings: hashed character n-grams computed locally with
+             NumPy, no API key or network needed
+"""
+import os
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from title_index import fold_text
+
+BACKENDS = ("openai", "hashing")
+
+_PRIME = np.uint64(0x100000001B3)
+
+
+def _mix(h):
+    """splitmix64 finaliser, so nearby n-gram hashes spread over every bucket."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Feature-hashed bag of character n-grams (`ngrams`, over the folded UTF-8
+    text), L2-normalised to `size` float32 dimensions.
+    Hashes are computed with NumPy, stable across processes and machines, so
+    vectors can be cached and indexed like any other embedding.
+    """
+
+    def __init__(self, size=512, ngrams=(3, 4, 5)):
+        self.size = size
+        self.ngrams = tuple(ngrams)
+        self.model = f"hashing-{size}-{'-'.join(map(str, self.ngrams))}"
+
+    def _hashes(self, data):
+        """One uint64 hash per n-gram window of `data` (a uint64 array of bytes)."""
+        out = []
+        with np.errstate(over="ignore"):
+            for n in self.ngrams:
+                if len(data) < n:
+                    continue
+                h = np.zeros(len(data) - n + 1, dtype=np.uint64)
+                for j in range(n):
+                    h = h * _PRIME + data[j:len(data) - n + 1 + j]
+                out.append(_mix(h + np.uint64(n)))
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.uint64)
+
+    def _embed(self, text):
+        # padding with spaces gives word starts and ends n-grams of their own
+        data = np.frombuffer(f" {fold_text(text or '')} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        hashes = self._hashes(data)
+
+        buckets = (hashes % np.uint64(self.size)).astype(np.intp)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+        vector = np.bincount(buckets, weights=signs, minlength=self.size).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_embeddings(backend=None):
+    """Embeddings for `backend` (default: $EMBEDDINGS_BACKEND, else "openai")."""
+    backend = backend or os.getenv("EMBEDDINGS_BACKEND", "openai")
+    if backend == "hashing":
+        return HashingEmbeddings()
+    if backend == "openai":
+        from langchain.embeddings import OpenAIEmbeddings
+        from embedding_cache import CachedEmbeddings
+        return CachedEmbeddings(OpenAIEmbeddings())
+    raise ValueError(f"unknown embeddings backend {backend!r} (expected one of {', '.join(BACKENDS)})")
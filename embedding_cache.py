@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+from langchain.schema.embeddings import Embeddings
+
+from index_store import embedding_model_name
+from llm_gateway import gateway
+
+CACHE_PATH = os.path.join("data", ".embeddings.sqlite3")
+
+
+def chunk_key(model, text):
+    """Cache key for one chunk: sha256 of the model name and the chunk text."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps another Embeddings object and keeps every document vector in a local
+    SQLite file, so a rebuild only sends new or changed chunks to the provider.
+    Query embeddings are not cached.
+    """
+
+    def __init__(self, embeddings, path=CACHE_PATH):
+        self.embeddings = embeddings
+        self.model = embedding_model_name(embeddings)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _lookup(self, keys):
+        found = {}
+        with self._connect() as conn:
+            # stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+        return found
+
+    def _store(self, items):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, self.model, array("f", vec).tobytes()) for key, vec in items],
+            )
+
+    def embed_documents(self, texts):
+        keys = [chunk_key(self.model, t) for t in texts]
+
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+
+            # embed each missing chunk once, even if it repeats in `texts`
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in found and key not in missing:
+                    missing[key] = text
+
+            if missing:
+                with gateway.slot():
+                    vectors = self.embeddings.embed_documents(list(missing.values()))
+                new = list(zip(missing.keys(), vectors))
+                self._store(new)
+                found.update(new)
+
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        # not gated: queries are embedded inside a QA call that already holds a slot
+        return self.embeddings.embed_query(text)
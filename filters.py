@@ -31,4 +31,42 @@ def grade_in_page(user_grade_text, page_text):
             if int(grade) == user_grade:
                 return True
 
-    return False
\ No newline at end of file
+    return False
+
+PREK = -1
+KINDERGARTEN = 0
+
+def grade_range(grade_text):
+    """
+    Map a grade label to an inclusive (low, high) interval of integer grades,
+    with PreK = -1 and Kindergarten = 0.
+
+    Handles UI bands ("K - 2", "3 - 5") and catalog labels ("Grade 3",
+    "Grades 3–5", "Grades PreK–2", "K-1–2", "Kindergarten", "PreK").
+    "Ages" labels are shifted to grades (age 5 = K) and clamped at PreK.
+    Returns None if nothing grade-like is found.
+    """
+    if not grade_text:
+        return None
+
+    text = grade_text.lower()
+    values = []
+    for token in re.findall(r'pre-?k|kindergarten|\bk\b|\d+', text):
+        if token.startswith("pre"):
+            values.append(PREK)
+        elif token.startswith("k"):
+            values.append(KINDERGARTEN)
+        else:
+            values.append(int(token))
+
+    if not values:
+        return None
+
+    if "age" in text:
+        values = [max(PREK, age - 5) for age in values]
+
+    return min(values), max(values)
+
+def ranges_overlap(a, b):
+    """True if two (low, high) grade intervals share at least one grade."""
+    return a[0] <= b[1] and b[0] <= a[1]
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+
+import faiss
+import numpy as np
+from langchain.docstore import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+from catalog_delta import diff_hashes
+
+INDEX_DIR = os.path.join("data", ".index")
+HASH_FILE = "catalog.sha256"
+# names the version directory under INDEX_DIR that is currently served
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "documents.json"
+VECTORS_FILE = "vectors.npy"
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+STORAGE_TYPES = ("float32", "float16", "int8", "pq")
+
+# build-time fields (type .. storage) are part of the index key; nprobe,
+# ef_search and rerank are applied at search time and can change freely
+IndexConfig = namedtuple(
+    "IndexConfig",
+    "type nlist pq_m hnsw_m train_size storage nprobe ef_search rerank",
+    defaults=("flat", 0, 16, 32, 20000, "float32", 8, 64, 4),
+)
+
+
+def index_config():
+    """IndexConfig from FAISS_INDEX, FAISS_NLIST, FAISS_PQ_M, FAISS_HNSW_M, FAISS_TRAIN_SIZE,
+    FAISS_STORAGE, FAISS_NPROBE, FAISS_EF_SEARCH and FAISS_RERANK; unset values keep
+    their defaults."""
+    defaults = IndexConfig()
+    config = IndexConfig(
+        type=os.getenv("FAISS_INDEX", defaults.type),
+        nlist=int(os.getenv("FAISS_NLIST", defaults.nlist)),
+        pq_m=int(os.getenv("FAISS_PQ_M", defaults.pq_m)),
+        hnsw_m=int(os.getenv("FAISS_HNSW_M", defaults.hnsw_m)),
+        train_size=int(os.getenv("FAISS_TRAIN_SIZE", defaults.train_size)),
+        storage=os.getenv("FAISS_STORAGE", defaults.storage),
+        nprobe=int(os.getenv("FAISS_NPROBE", defaults.nprobe)),
+        ef_search=int(os.getenv("FAISS_EF_SEARCH", defaults.ef_search)),
+        rerank=int(os.getenv("FAISS_RERANK", defaults.rerank)),
+    )
+    if config.type not in INDEX_TYPES:
+        raise ValueError(f"unknown FAISS_INDEX {config.type!r} (expected one of {', '.join(INDEX_TYPES)})")
+    if config.storage not in STORAGE_TYPES:
+        raise ValueError(f"unknown FAISS_STORAGE {config.storage!r} (expected one of {', '.join(STORAGE_TYPES)})")
+    return config
+
+
+def is_lossy(config):
+    """True if the index keeps compressed codes, so results are re-ranked
+    against the full-precision vectors saved next to it."""
+    return config.storage != "float32" or config.type == "ivfpq"
+
+
+def factory_string(config, dim, count):
+    """
+    faiss.index_factory description for `config` over `count` vectors of
+    `dim` dimensions. nlist defaults to ~4*sqrt(count), and is capped so
+    every list gets at least 39 training points; PQ uses the largest
+    sub-quantiser count <= pq_m that divides `dim`, with fewer bits per
+    code when there are too few vectors to train 256 centroids well.
+
+    `config.storage` picks how each vector is stored: "Flat" float32,
+    "SQfp16", "SQ8" (int8 scalar quantiser) or PQ codes.
+    """
+    sample = min(count, config.train_size)
+    m = next(m for m in range(min(config.pq_m, dim), 0, -1) if dim % m == 0)
+    nbits = max(1, min(8, int(math.log2(max(sample // 39, 2)))))
+    pq = f"PQ{m}x{nbits}"
+    codes = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8", "pq": pq}[config.storage]
+
+    if config.type == "flat":
+        # IndexPQ can't take an IDSelector, so a flat PQ scan is an IVF with a single list
+        return f"IVF1,{pq}" if config.storage == "pq" else codes
+    if config.type == "hnsw":
+        return f"HNSW{config.hnsw_m},{codes}"
+
+    nlist = config.nlist or int(4 * math.sqrt(count))
+    nlist = max(1, min(nlist, sample // 39))
+    return f"IVF{nlist},{pq if config.type == 'ivfpq' else codes}"
+
+
+def train_sample(vectors, size, seed=0):
+    """At most `size` rows of `vectors`, drawn without replacement."""
+    if len(vectors) <= size:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def build_index(config, vectors):
+    """Empty faiss index for `config`, trained on a sample of `vectors` (which are not added)."""
+    index = faiss.index_factory(vectors.shape[1], factory_string(config, vectors.shape[1], len(vectors)), faiss.METRIC_L2)
+    if hasattr(index, "do_polysemous_training"):
+        # polysemous codes are never used for search here, and training them dominates build time
+        index.do_polysemous_training = False
+    if not index.is_trained:
+        index.train(train_sample(vectors, config.train_size))
+    tune_index(index, config)
+    return index
+
+
+def tune_index(index, config):
+    """Apply the search-time knobs (nprobe, efSearch) of `config` to `index`."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.nprobe, ivf.nlist)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = config.ef_search
+
+
+def search_parameters(index, sel=None):
+    """SearchParameters carrying `sel` plus the index's own nprobe/efSearch,
+    since passing parameters to a search replaces the index defaults."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=ivf.nprobe)
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=sel)
+
+
+def rerank(full_vectors, query, candidates, k):
+    """
+    The `k` of `candidates` (index ids) closest to `query` by exact L2
+    against `full_vectors`; only the candidate rows are read, so a memmapped
+    file stays on disk (and in the shared page cache) otherwise.
+    """
+    if not candidates:
+        return []
+    distances = ((full_vectors[np.asarray(candidates)] - query) ** 2).sum(axis=1)
+    return [candidates[i] for i in np.argsort(distances, kind="stable")[:k]]
+
+
+def _attach_vectors(db, store_dir, config):
+    """Tune a loaded store and attach its on-disk full-precision vectors, if any."""
+    tune_index(db.index, config)
+    path = os.path.join(store_dir, VECTORS_FILE)
+    db.full_vectors = np.load(path, mmap_mode="r") if is_lossy(config) and os.path.exists(path) else None
+    db.rerank_factor = config.rerank
+    return db
+
+
+def _from_documents(docs, embeddings, ids, config):
+    """
+    FAISS.from_documents, but into the index type of `config`. Returns the
+    store and, for lossy storage, the float32 vectors (in index order) to
+    save next to it for re-ranking.
+    """
+    if (config.type == "flat" and not is_lossy(config)) or not docs:
+        return FAISS.from_documents(docs, embeddings, ids=ids), None
+
+    texts = [doc.page_content for doc in docs]
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    db = FAISS(embeddings, build_index(config, vectors), InMemoryDocstore(), {})
+    db.add_embeddings(zip(texts, vectors.tolist()), metadatas=[doc.metadata for doc in docs], ids=ids)
+    return db, (vectors if is_lossy(config) else None)
+
+
+def embedding_model_name(embeddings):
+    """Best-effort name of the embedding model, used as part of the index key."""
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def catalog_hash(file_path, *key_parts):
+    """sha256 of the catalog file plus anything else the index depends on."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    for part in key_parts:
+        h.update(b"\0" + str(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _current_dir(store_dir):
+    """The version directory the pointer file in `store_dir` names, or None."""
+    try:
+        with open(os.path.join(store_dir, POINTER_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(store_dir, version) if version else None
+
+
+def _publish(store_dir, version_dir):
+    """
+    Point `store_dir` at `version_dir` with an atomic rename of the pointer
+    file, then delete every older version except the one just replaced,
+    which other workers may still be loading.
+    """
+    previous = _current_dir(store_dir)
+    pointer_tmp = os.path.join(store_dir, f"{POINTER_FILE}.tmp-{os.getpid()}-{threading.get_ident()}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_dir))
+    os.replace(pointer_tmp, os.path.join(store_dir, POINTER_FILE))
+
+    keep = {os.path.basename(version_dir), previous and os.path.basename(previous)}
+    for name in os.listdir(store_dir):
+        if name.startswith("v-") and name not in keep:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+    # stores saved before versioning kept their files at the top level
+    for name in ("index.faiss", "index.pkl", HASH_FILE, MANIFEST_FILE, VECTORS_FILE):
+        try:
+            os.remove(os.path.join(store_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def _stored_hash(store_dir):
+    try:
+        with open(os.path.join(store_dir, HASH_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def document_hash(doc):
+    """sha256 of one Document's text and metadata."""
+    payload = json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stored_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_or_build_index(file_path, build_documents, embeddings, store_dir=INDEX_DIR, config=None):
+    """
+    Return a FAISS store for `file_path`, loading it from `store_dir` when the
+    saved hash matches the catalog and updating (then saving) it otherwise.
+    Each save is a new version directory under `store_dir`, switched to by
+    atomically replacing its POINTER_FILE.
+
+    `build_documents(file_path)` returns the list of Documents to embed. If
+    every Document has a "record_id" in its metadata, an edited catalog is
+    applied as a delta: only added or changed records are embedded and
+    removed ones are deleted, instead of rebuilding the whole index.
+
+    `config` (default: index_config()) picks a flat, IVF-Flat, IVF-PQ or
+    HNSW index and how vectors are stored in it. Only a flat float32 index
+    can delete records in place, so edits and removals rebuild the others
+    (unchanged chunks still come from the embedding cache). Lossy storage
+    (float16, int8, PQ) also saves the float32 vectors to VECTORS_FILE,
+    mmapped as `db.full_vectors` for re-ranking; any edit rebuilds it.
+    """
+    config = config or index_config()
+    # a different chunker or index type means a different index, so both are part of the key
+    model, builder = embedding_model_name(embeddings), build_documents.__name__
+    layout = config.type if config[:6] == IndexConfig()[:6] else ":".join(map(str, config[:6]))
+    key = catalog_hash(file_path, model, builder, layout)
+
+    current = _current_dir(store_dir)
+    if current and _stored_hash(current) == key:
+        # the index was written by us, so the pickled docstore is trusted
+        db = FAISS.load_local(current, embeddings, allow_dangerous_deserialization=True)
+        return _attach_vectors(db, current, config)
+
+    docs = build_documents(file_path)
+    ids = [doc.metadata.get("record_id") for doc in docs]
+    if not all(ids) or len(set(ids)) != len(ids):
+        ids = None
+    hashes = {rid: document_hash(doc) for rid, doc in zip(ids, docs)} if ids else {}
+
+    manifest = _stored_manifest(current) if current else None
+    delta = None
+    if ids and manifest and (manifest.get("model"), manifest.get("builder"), manifest.get("layout")) == (model, builder, layout):
+        delta = diff_hashes(manifest["documents"], hashes)
+        if config.type != "flat" and (delta.changed or delta.removed) or is_lossy(config):
+            delta = None
+
+    vectors = None
+    if delta is not None:
+        db = FAISS.load_local(current, embeddings, allow_dangerous_deserialization=True)
+        if delta.changed or delta.removed:
+            db.delete(delta.changed + delta.removed)
+        fresh = set(delta.added + delta.changed)
+        if fresh:
+            db.add_documents([doc for rid, doc in zip(ids, docs) if rid in fresh],
+                             ids=[rid for rid in ids if rid in fresh])
+    else:
+        db, vectors = _from_documents(docs, embeddings, ids, config)
+
+    # every save gets a fresh version directory, only published once complete,
+    # so other workers never see a half-saved or half-deleted index
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f"tmp-{os.getpid()}-{threading.get_ident()}-", dir=store_dir)
+    db.save_local(tmp_dir)
+    with open(os.path.join(tmp_dir, HASH_FILE), "w", encoding="utf-8") as f:
+        f.write(key)
+    if vectors is not None:
+        np.save(os.path.join(tmp_dir, VECTORS_FILE), vectors)
+    if ids:
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"model": model, "builder": builder, "layout": layout, "documents": hashes}, f, ensure_ascii=False)
+    version_dir = os.path.join(store_dir, "v-" + os.path.basename(tmp_dir)[len("tmp-"):])
+    os.rename(tmp_dir, version_dir)
+    _publish(store_dir, version_dir)
+
+    # reload the saved vectors as a memmap rather than keeping them in memory
+    return _attach_vectors(db, version_dir, config)
@@ -0,0 +1,82 @@
+import bisect
+import copy
+
+from title_index import fold_text, normalize_title
+
+
+class IndividualCatalog:
+    """
+    The individual titles of data/indivuals.txt with in-memory author and
+    title indexes, so author and single-title lookups never need retrieval
+    or an LLM call.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self._by_author = {}      # folded author -> [record index, ...]
+        self._by_title = {}       # title key -> [record index, ...]
+
+        for i, record in enumerate(self.records):
+            if record.author:
+                self._by_author.setdefault(fold_text(record.author), []).append(i)
+            for key in normalize_title(record.title):
+                self._by_title.setdefault(key, []).append(i)
+
+        self._authors = sorted(self._by_author)
+        # book catalog links, set by linked()
+        self._entries = {}        # folded collection name -> collection entry
+        self._title_index = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from IndividualRecords (iter_individuals() or a snapshot's individuals())."""
+        return cls(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def by_author(self, author):
+        """Every individual listing by `author` (case and accent insensitive)."""
+        return [self.records[i] for i in self._by_author.get(fold_text(author), ())]
+
+    def authors(self, prefix):
+        """Author names starting with `prefix`, each with their listings."""
+        query = fold_text(prefix)
+        if not query:
+            return []
+        results = []
+        for i in range(bisect.bisect_left(self._authors, query), len(self._authors)):
+            key = self._authors[i]
+            if not key.startswith(query):
+                break
+            listings = [self.records[j] for j in self._by_author[key]]
+            results.append((listings[0].author, listings))
+        return results
+
+    def by_title(self, title):
+        """Individual listings for an exact title (same normalisation as TitleIndex)."""
+        keys = normalize_title(title)
+        return [self.records[i] for i in self._by_title.get(keys[0], ())] if keys else []
+
+    def linked(self, collections, title_index):
+        """
+        Copy whose listings are linked to the book catalog: a folded-name map
+        of `collections` (from load_catalog()) and the TitleIndex, so
+        collection_entries() is two dict lookups.
+        """
+        linked = copy.copy(self)
+        linked._entries = {}
+        for entry in collections:
+            # first spelling of a collection name wins, like parse_book_entries
+            linked._entries.setdefault(fold_text(entry["collection"]), entry)
+        linked._title_index = title_index
+        return linked
+
+    def collection_entries(self, record):
+        """
+        Link one individual listing to the catalog: the collection entry of the
+        same name, if any, and every (title, collection, grade) offering that
+        includes the same title. Empty until linked() is called.
+        """
+        entry = self._entries.get(fold_text(record.collection)) if record.collection else None
+        return entry, self._title_index.lookup(record.title) if self._title_index else []
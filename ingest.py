@@ -0,0 +1,104 @@
+"""
+Parallel ingestion of large or many catalog files.
+
+    python ingest.py "vendor/*.txt" [--workers N] [--shard-mb N]
+
+Each file is cut into byte-range shards that start and end on `---`
+separator lines, the shards are parsed in a process pool, and the results
+are stitched back together in (file, offset) order, so the output is the
+same as parsing the files one after another.
+"""
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from parse_book_entries import collections_from_records, parse_records
+
+SHARD_SIZE = 8 << 20           # 8 MiB
+
+
+def catalog_files(source):
+    """Sorted catalog files for a directory (its *.txt files), a glob pattern or a single file."""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.txt")))
+    if os.path.isfile(source):
+        return [source]
+    return sorted(glob.glob(source))
+
+
+def shard_file(file_path, shard_size=SHARD_SIZE):
+    """
+    Split one file into (file_path, start, end) byte ranges of roughly
+    `shard_size` bytes. Every boundary sits just after a `---` line, so no
+    record is split between two shards.
+    """
+    size = os.path.getsize(file_path)
+    shards = []
+    start = 0
+
+    with open(file_path, "rb") as f:
+        while start < size:
+            end = start + shard_size
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()          # finish the line we landed in
+                while True:
+                    line = f.readline()
+                    if not line:
+                        end = size
+                        break
+                    if line.strip() == b"---":
+                        end = f.tell()
+                        break
+            shards.append((file_path, start, end))
+            start = end
+
+    return shards
+
+
+def parse_shard(shard):
+    """Parse one (file_path, start, end) byte range into a list of BookRecords."""
+    file_path, start, end = shard
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    return list(parse_records(text.splitlines()))
+
+
+def ingest_records(source, workers=None, shard_size=SHARD_SIZE):
+    """Every BookRecord from the files in `source`, in file and offset order."""
+    shards = [s for path in catalog_files(source) for s in shard_file(path, shard_size)]
+    if not shards:
+        return []
+
+    if workers == 1 or len(shards) == 1:
+        results = map(parse_shard, shards)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() returns results in submission order, whatever order they finish in
+            results = list(pool.map(parse_shard, shards))
+
+    return [record for shard_records in results for record in shard_records]
+
+
+def ingest(source, workers=None, shard_size=SHARD_SIZE):
+    """
+    parse_book_entries() over every file in `source`: the first spelling of
+    a collection name wins and grades are merged across shards and files.
+    """
+    return collections_from_records(ingest_records(source, workers, shard_size))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse catalog files in parallel.")
+    parser.add_argument("source", help="directory, glob pattern or file")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-mb", type=float, default=SHARD_SIZE / (1 << 20))
+    args = parser.parse_args()
+
+    records = ingest_records(args.source, args.workers, int(args.shard_mb * (1 << 20)))
+    collections = collections_from_records(records)
+    print(f"{len(records)} records, {len(collections)} collections")
@@ -27,38 +27,346 @@
 #     return qa_chain.invoke({"question": query})
 
 import os
+import re
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+from functools import lru_cache
+from typing import Optional
+import faiss
+import numpy as np
 from dotenv import load_dotenv
+from pydantic import ConfigDict
 from langchain_openai import OpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.chains import RetrievalQAWithSourcesChain
+from langchain.schema.retriever import BaseRetriever
+from langchain_core.prompts import format_document
+from index_store import load_or_build_index, rerank, search_parameters
+from embedding_backends import make_embeddings
+from parse_book_entries import split_records
+from record_index import record_id
+from filters import grade_range, ranges_overlap
+from llm_gateway import gateway
+from bm25 import BM25Index, reciprocal_rank_fusion
 
 # Load environment variables
 load_dotenv()
 
-def load_books():
-    """Load the book entries and prepare the retriever."""
-    with open("data/book_entries.txt", "r", encoding="utf-8") as f:
+# Process-wide caches, shared by every Streamlit session. Entries keep a
+# reference to the object they were keyed on so its id() can't be reused;
+# catalog_retriever drops the ones for a store it replaces.
+_cache_lock = threading.Lock()
+_grade_retrievers = {}
+_bm25_indexes = {}
+_qa_chains = {}
+_loop = None
+
+# Single-flight state: identical queries on the same retriever share one call.
+_in_flight = {}
+_coalesce_counts = {"calls": 0, "coalesced": 0}
+
+def book_documents(file_path):
+    """One Document per catalog record, with collection/grade/price metadata."""
+    with open(file_path, "r", encoding="utf-8") as f:
         text = f.read()
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    docs = splitter.split_documents([Document(page_content=text)])
+    docs = []
+    seen = {}
+    for body, fields in split_records(text):
+        metadata = dict(fields)
+        # RetrievalQAWithSourcesChain cites documents by their "source"
+        metadata["source"] = f"{fields['collection']} ({fields['grade']})"
+        # stable per-record id, so index_store can apply catalog edits as deltas
+        metadata["record_id"] = record_id(fields["collection"], fields["grade"], seen)
+        docs.append(Document(page_content=body, metadata=metadata))
+    return docs
+
+def load_books(mode="vector"):
+    """Load the book entries and prepare the retriever.
 
-    embeddings = OpenAIEmbeddings()
-    db = FAISS.from_documents(docs, embeddings)
+    The FAISS index is cached on disk and only rebuilt when the catalog changes;
+    a rebuild only embeds chunks that are not already in the embedding cache.
+    `mode` is "vector", "hybrid" or "lexical" (see catalog_retriever); the
+    embedding backend comes from EMBEDDINGS_BACKEND (see embedding_backends).
+    """
+    embeddings = make_embeddings()
+    db = load_or_build_index("data/book_entries.txt", book_documents, embeddings)
 
-    retriever = db.as_retriever()
+    retriever = catalog_retriever(db, mode)
     return retriever
 
+def catalog_retriever(db, mode="vector", k=4):
+    """Retriever over a FAISS store: plain vector search, BM25 + vector fused, or BM25 only."""
+    if mode not in ("vector", "hybrid", "lexical"):
+        raise ValueError(f"unknown retrieval mode {mode!r}")
+    _forget_other_stores(db)
+    # compressed stores always go through GradeFilteredRetriever, which re-ranks
+    if mode == "vector" and getattr(db, "full_vectors", None) is None:
+        return db.as_retriever(search_kwargs={"k": k})
+    return GradeFilteredRetriever(vectorstore=db, k=k, mode=mode)
+
+def _forget_other_stores(db):
+    """Drop cache entries built on any store but `db`, so a replaced index can be freed."""
+    with _cache_lock:
+        for cache in (_grade_retrievers, _bm25_indexes):
+            for key in [key for key, (owner, _) in cache.items() if owner is not db]:
+                del cache[key]
+        for key in [key for key, (retriever, _) in _qa_chains.items() if retriever.vectorstore is not db]:
+            del _qa_chains[key]
+
+def bm25_index(db):
+    """BM25Index over a FAISS store's documents, in index order (so BM25 doc i is FAISS id i)."""
+    with _cache_lock:
+        cached = _bm25_indexes.get(id(db))
+        if cached and cached[0] is db and len(cached[1]) == db.index.ntotal:
+            return cached[1]
+
+    texts = [db.docstore.search(db.index_to_docstore_id[i]).page_content for i in range(db.index.ntotal)]
+    index = BM25Index(texts)
+    with _cache_lock:
+        _bm25_indexes[id(db)] = (db, index)
+    return index
+
+class GradeFilteredRetriever(BaseRetriever):
+    """
+    FAISS search restricted to a fixed set of index ids (None searches every
+    document). The ids go to FAISS as an IDSelector, so other documents are
+    skipped before any distance is computed instead of being filtered out of
+    the results afterwards. IVF and HNSW indexes keep their nprobe/efSearch,
+    and compressed (float16, int8, PQ) stores are re-ranked against the
+    full-precision vectors index_store attaches as `db.full_vectors`.
+
+    `mode` is "vector" (FAISS only), "lexical" (BM25 only, no embedding call)
+    or "hybrid" (the top `fetch_k` of each, fused by reciprocal rank).
+    """
+    vectorstore: FAISS
+    ids: Optional[list] = None
+    k: int = 4
+    mode: str = "vector"
+    fetch_k: int = 20
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _dense(self, query, k):
+        db = self.vectorstore
+        vector = np.array([db.embeddings.embed_query(query)], dtype=np.float32)
+        if db._normalize_L2:
+            faiss.normalize_L2(vector)
+
+        # compressed vectors: over-fetch, then re-rank against the full-precision copy on disk
+        full_vectors = getattr(db, "full_vectors", None)
+        fetch = k * db.rerank_factor if full_vectors is not None else k
+
+        if self.ids is None:
+            _, indices = db.index.search(vector, min(fetch, db.index.ntotal))
+        else:
+            params = search_parameters(db.index, faiss.IDSelectorBatch(self.ids))
+            _, indices = db.index.search(vector, min(fetch, len(self.ids)), params=params)
+        hits = [int(i) for i in indices[0] if i != -1]
+        return rerank(full_vectors, vector[0], hits, k) if full_vectors is not None else hits
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        db = self.vectorstore
+        if self.ids is not None and not self.ids or not db.index.ntotal:
+            return []
+
+        if self.mode == "lexical":
+            hits = bm25_index(db).search(query, self.k, self.ids)
+        elif self.mode == "hybrid":
+            rankings = [self._dense(query, self.fetch_k), bm25_index(db).search(query, self.fetch_k, self.ids)]
+            hits = reciprocal_rank_fusion(rankings)[:self.k]
+        else:
+            hits = self._dense(query, self.k)
+
+        return [db.docstore.search(db.index_to_docstore_id[i]) for i in hits]
+
+def grade_retriever(retriever, grade, k=4):
+    """
+    Retriever over the same index as `retriever` that only searches records
+    whose grade interval overlaps `grade` (a UI band such as "3 - 5").
+    Records without a recognisable grade are always searched.
+    """
+    db = retriever.vectorstore
+    mode = getattr(retriever, "mode", "vector")
+    wanted = grade_range(grade)
+    if wanted is None:
+        return retriever
+
+    # one retriever per (index, band, mode) so the chain cache below can reuse it
+    key = (id(db), wanted, k, mode)
+    with _cache_lock:
+        cached = _grade_retrievers.get(key)
+        if cached and cached[0] is db:
+            return cached[1]
+
+    ids = []
+    for i, doc_id in db.index_to_docstore_id.items():
+        have = grade_range(db.docstore.search(doc_id).metadata.get("grade"))
+        if have is None or ranges_overlap(have, wanted):
+            ids.append(i)
+
+    filtered = GradeFilteredRetriever(vectorstore=db, ids=ids, k=k, mode=mode)
+    with _cache_lock:
+        _grade_retrievers[key] = (db, filtered)
+    return filtered
+
+@lru_cache(maxsize=None)
+def get_llm(temperature=0.2, model=None):
+    """Shared LLM client per model config, so its connection pool is reused."""
+    if model:
+        return OpenAI(temperature=temperature, model=model)
+    return OpenAI(temperature=temperature)
+
+def get_qa_chain(retriever, temperature=0.2, model=None):
+    """Long-lived QA chain per retriever and model config."""
+    key = (id(retriever), temperature, model)
+    with _cache_lock:
+        cached = _qa_chains.get(key)
+        if cached and cached[0] is retriever:
+            return cached[1]
+
+        qa_chain = RetrievalQAWithSourcesChain.from_chain_type(
+            llm=get_llm(temperature, model),
+            chain_type="stuff",
+            retriever=retriever,
+            return_source_documents=True,
+        )
+        _qa_chains[key] = (retriever, qa_chain)
+        return qa_chain
+
+def coalescing_stats():
+    """How many get_response/aget_response calls were made and how many of them
+    were answered by an identical call already in flight (LLM calls saved)."""
+    with _cache_lock:
+        return dict(_coalesce_counts)
+
+def _join_flight(query, retriever):
+    """Return (key, future, is_leader) for this query; only the leader makes the call."""
+    key = (id(retriever), " ".join(query.lower().split()))
+    with _cache_lock:
+        _coalesce_counts["calls"] += 1
+        future = _in_flight.get(key)
+        if future is not None:
+            _coalesce_counts["coalesced"] += 1
+            return key, future, False
+        future = Future()
+        _in_flight[key] = future
+        return key, future, True
+
+def _land_flight(key, future, result=None, error=None):
+    with _cache_lock:
+        _in_flight.pop(key, None)
+    if error is None:
+        future.set_result(result)
+    elif isinstance(error, asyncio.CancelledError):
+        # the leader was cancelled; followers retry and one of them takes over
+        future.cancel()
+    else:
+        future.set_exception(error)
+
 def get_response(query, retriever):
     """Retrieve answer + source documents."""
-    qa_chain = RetrievalQAWithSourcesChain.from_chain_type(
-        llm=OpenAI(temperature=0.2),
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-    )
-
-    return qa_chain.invoke({"question": query})
+    while True:
+        key, future, leader = _join_flight(query, retriever)
+        if not leader:
+            try:
+                return future.result()
+            except CancelledError:
+                continue
+
+        try:
+            with gateway.slot():
+                result = get_qa_chain(retriever).invoke({"question": query})
+        except BaseException as e:
+            _land_flight(key, future, error=e)
+            raise
+        _land_flight(key, future, result)
+        return result
+
+async def aget_response(query, retriever):
+    """Async get_response; waits for a gateway slot without blocking the loop."""
+    while True:
+        key, future, leader = _join_flight(query, retriever)
+        if not leader:
+            try:
+                # shield so one follower being cancelled doesn't cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                # retry only if the leader was cancelled, never when this task is
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        try:
+            async with gateway.aslot():
+                result = await get_qa_chain(retriever).ainvoke({"question": query})
+        except BaseException as e:
+            _land_flight(key, future, error=e)
+            raise
+        _land_flight(key, future, result)
+        return result
+
+def stream_response(query, retriever):
+    """
+    Streaming version of get_response: yields the answer text as the LLM
+    generates it. The model ends its answer with a "SOURCES:" line, so the
+    sources arrive as the last chunks (see split_sources).
+    """
+    # same documents and prompt as the cached chain, but streamed from the LLM
+    stuff_chain = get_qa_chain(retriever).combine_documents_chain
+
+    with gateway.slot():
+        docs = retriever.invoke(query)
+        context = stuff_chain.document_separator.join(format_document(doc, stuff_chain.document_prompt) for doc in docs)
+        prompt = stuff_chain.llm_chain.prompt.format(**{stuff_chain.document_variable_name: context, "question": query})
+
+        for chunk in stuff_chain.llm_chain.llm.stream(prompt):
+            yield chunk
+
+
+def split_sources(text):
+    """(answer, sources) of a streamed completion, split the way the QA chain splits its own."""
+    if not re.search(r"SOURCES?:", text, re.IGNORECASE):
+        return text, ""
+    answer, sources = re.split(r"SOURCES?:|QUESTION:\s", text, flags=re.IGNORECASE)[:2]
+    return answer, sources.split("\n")[0].strip()
+
+
+def is_answer(text):
+    """True if the LLM found something: non-empty and not an "I don't know"."""
+    return bool(text and text.strip()) and "i don't know" not in text.lower()
+
+def _background_loop():
+    """One long-lived event loop for async chain calls, so the shared LLM
+    client's async connection pool always stays on the same loop."""
+    global _loop
+    with _cache_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="langchain-helper-loop", daemon=True).start()
+    return _loop
+
+def run_async(coro):
+    """Run a coroutine on the background loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+async def _speculative(strict_query, strict_retriever, broad_query, broad_retriever):
+    broad = asyncio.ensure_future(aget_response(broad_query, broad_retriever))
+    try:
+        strict = await aget_response(strict_query, strict_retriever)
+        if is_answer(strict["answer"]):
+            return strict, "strict"
+        return await broad, "broad"
+    finally:
+        # no-op if the broad call already finished
+        broad.cancel()
+
+def get_response_speculative(strict_query, strict_retriever, broad_query, broad_retriever):
+    """
+    Start the strict and the broad query at the same time. Returns
+    (response, "strict") when the strict answer is usable, cancelling the
+    broad call, and (broad response, "broad") otherwise.
+    """
+    return run_async(_speculative(strict_query, strict_retriever, broad_query, broad_retriever))
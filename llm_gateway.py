@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+
+class GatewayBusy(RuntimeError):
+    """Raised when the gateway queue is full or a caller waited too long for a slot."""
+
+
+class LLMGateway:
+    """
+    Process-wide cap on concurrent LLM and embedding calls.
+
+    At most `max_concurrent` calls run at once; up to `max_queue` more wait
+    for a slot (for at most `timeout` seconds). Anything beyond that is
+    rejected straight away with GatewayBusy, so a burst turns into fast
+    "try again" errors instead of a pile of provider timeouts.
+
+    Works from plain threads (`slot`) and from coroutines (`aslot`), on any
+    event loop.
+    """
+
+    def __init__(self, max_concurrent=8, max_queue=64, timeout=60):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        # async callers wait for a slot here, never in the loop's default executor,
+        # which the slot holders need for their own sync retriever/embedding calls
+        self._waiters = ThreadPoolExecutor(max_workers=max(1, max_queue), thread_name_prefix="llm-gateway-wait")
+
+    @property
+    def queue_depth(self):
+        """Number of calls currently waiting for a slot."""
+        return self._waiting
+
+    @property
+    def in_flight(self):
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    def stats(self):
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+    def _join_queue(self):
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise GatewayBusy(f"{self._waiting} LLM calls already queued")
+            self._waiting += 1
+
+    def _leave_queue(self, acquired):
+        with self._lock:
+            self._waiting -= 1
+            if acquired:
+                self._in_flight += 1
+
+    def _check(self, acquired):
+        if not acquired:
+            raise GatewayBusy(f"no LLM slot free after {self.timeout}s")
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot for the duration of a blocking call."""
+        self._join_queue()
+        acquired = False
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            self._leave_queue(acquired)
+        self._check(acquired)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Hold one slot for the duration of an async call."""
+        self._join_queue()
+        acquired = self._slots.acquire(blocking=False)
+        try:
+            if not acquired:
+                # wait in a gateway thread so the event loop keeps running
+                waiter = asyncio.get_running_loop().run_in_executor(
+                    self._waiters, self._slots.acquire, True, self.timeout
+                )
+                try:
+                    acquired = await asyncio.shield(waiter)
+                except asyncio.CancelledError:
+                    # the thread may still get the slot later; hand it straight back
+                    waiter.add_done_callback(lambda f: f.result() and self._slots.release())
+                    raise
+        finally:
+            self._leave_queue(acquired)
+        self._check(acquired)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+gateway = LLMGateway(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "60")),
+)
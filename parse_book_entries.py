@@ -1,3 +1,213 @@
+import sys
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+
+
+def _reduce_record(record):
+    # frozen + __slots__ records can't be unpickled field by field; rebuild them instead
+    return type(record), tuple(getattr(record, name) for name in record.__slots__)
+
+
+@dataclass(frozen=True)
+class BookRecord:
+    """One `---` block of the catalog. Prices are integer cents (None if missing)."""
+    __slots__ = ("collection", "grade", "list_price", "price", "savings", "description", "titles")
+
+    collection: str
+    grade: Optional[str]
+    list_price: Optional[int]
+    price: Optional[int]      # "Your Price"
+    savings: Optional[str]
+    description: str
+    titles: tuple
+
+    __reduce__ = _reduce_record
+
+
+@dataclass(frozen=True)
+class IndividualRecord:
+    """One Grade/Collection/Title/Author block of data/indivuals.txt."""
+    __slots__ = ("grade", "collection", "title", "author")
+
+    grade: Optional[str]      # age band or grade label as written, e.g. "Ages 0–4"
+    collection: Optional[str]
+    title: str
+    author: Optional[str]
+
+    __reduce__ = _reduce_record
+
+
+# one tuple per distinct list of grade labels, shared by every CollectionEntry that offers it
+_grade_labels = {}
+
+
+class CollectionEntry:
+    """
+    Compact, read-only catalog entry: one collection name and its
+    {grade: "Your Price"} offerings, kept as a shared tuple of grade labels
+    and a tuple of prices. Supports entry["collection"] and entry["grades"]
+    like the dicts parse_book_entries() returns.
+    """
+    __slots__ = ("collection", "_labels", "_prices")
+
+    def __init__(self, collection, grades):
+        labels = tuple(grades)
+        object.__setattr__(self, "collection", collection)
+        object.__setattr__(self, "_labels", _grade_labels.setdefault(labels, labels))
+        object.__setattr__(self, "_prices", tuple(grades.values()))
+
+    @property
+    def grades(self):
+        """Read-only {grade: price} mapping, built on access."""
+        return MappingProxyType(dict(zip(self._labels, self._prices)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CollectionEntry is read-only")
+
+    def __getitem__(self, key):
+        if key in ("collection", "grades"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __repr__(self):
+        return f"CollectionEntry({self.collection!r}, {dict(self.grades)!r})"
+
+
+def _intern(text):
+    """sys.intern for optional strings: repeated names and labels share one object."""
+    return sys.intern(text) if text else text
+
+
+def parse_price(text):
+    """Price text such as "$1,234.50" -> 123450 cents; None if there is no number."""
+    digits = text.replace("$", "").replace(",", "").strip()
+    if not digits:
+        return None
+    whole, _, frac = digits.partition(".")
+    try:
+        return int(whole or "0") * 100 + int((frac + "00")[:2])
+    except ValueError:
+        return None
+
+
+def format_price(cents):
+    """123450 cents -> "$1,234.50"."""
+    return f"${cents // 100:,}.{cents % 100:02d}"
+
+
+def iter_records(file_path):
+    """
+    Read the catalog line by line and yield one BookRecord per `---` block,
+    keeping every field. Blocks without a Collection line are skipped.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from parse_records(f)
+
+
+def parse_records(lines):
+    """iter_records() over any iterable of catalog lines (a file, a shard, ...)."""
+    fields = {}
+    titles = []
+    title_table = {}          # one shared str object per distinct title
+    section = None            # "description" or "titles" while inside one
+
+    def build():
+        if not fields.get("collection"):
+            return None
+        return BookRecord(
+            collection=_intern(fields["collection"]),
+            grade=_intern(fields.get("grade")),
+            list_price=fields.get("list_price"),
+            price=fields.get("price"),
+            savings=_intern(fields.get("savings")),
+            description=fields.get("description", ""),
+            titles=tuple(titles),
+        )
+
+    for raw in lines:
+        line = raw.strip()
+
+        if line == "---":
+            record = build()
+            if record:
+                yield record
+            fields, titles, section = {}, [], None
+
+        elif line.startswith("Collection:"):
+            fields["collection"] = line.replace("Collection:", "").strip()
+            section = None
+        elif line.startswith("Grade:"):
+            fields["grade"] = line.replace("Grade:", "").strip()
+            section = None
+        elif line.startswith("List Price:"):
+            fields["list_price"] = parse_price(line.replace("List Price:", ""))
+            section = None
+        elif line.startswith("Your Price:"):
+            fields["price"] = parse_price(line.replace("Your Price:", ""))
+            section = None
+        elif line.startswith("Savings:"):
+            fields["savings"] = line.replace("Savings:", "").strip()
+            section = None
+        elif line.startswith("Description:"):
+            fields["description"] = line.replace("Description:", "").strip()
+            section = "description"
+        elif line.startswith("Book Titles:"):
+            section = "titles"
+
+        elif section == "titles" and line.startswith("- "):
+            title = line[2:].strip()
+            titles.append(title_table.setdefault(title, title))
+        elif section == "description" and line:
+            # description wrapped over several lines
+            fields["description"] += " " + line
+
+    record = build()
+    if record:
+        yield record
+
+
+def iter_individuals(file_path):
+    """
+    Yield one IndividualRecord per block of data/indivuals.txt. Blocks are
+    separated by blank lines; blocks without a Title line are skipped.
+    """
+    fields = {}
+
+    def build():
+        if not fields.get("title"):
+            return None
+        # age bands and collection names repeat across listings; keep one copy each
+        return IndividualRecord(
+            grade=_intern(fields.get("grade")),
+            collection=_intern(fields.get("collection")),
+            title=fields["title"],
+            author=_intern(fields.get("author")),
+        )
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+
+            if not line:
+                record = build()
+                if record:
+                    yield record
+                fields = {}
+            elif line.startswith("Grade:"):
+                fields["grade"] = line.replace("Grade:", "").strip()
+            elif line.startswith("Collection:"):
+                fields["collection"] = line.replace("Collection:", "").strip()
+            elif line.startswith("Title:"):
+                fields["title"] = line.replace("Title:", "").strip()
+            elif line.startswith("Author:"):
+                fields["author"] = line.replace("Author:", "").strip()
+
+    record = build()
+    if record:
+        yield record
+
+
 def parse_book_entries(file_path):
     """
     Returns a list like:
@@ -23,39 +233,58 @@ def parse_book_entries(file_path):
         ...
     ]
     """
+    # thin view over iter_records(): keep the name and the "Your Price" per grade
+    return collections_from_records(iter_records(file_path))
+
+def collections_from_records(records):
+    """Fold BookRecords into the parse_book_entries() list, in record order."""
     collections = {}          # key = collection name, value = {"collection": name, "grades": {}}
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    for record in records:
+        # first spelling of a collection name wins, grades are merged
+        if record.collection not in collections:
+            collections[record.collection] = {
+                "collection": record.collection,
+                "grades": {}
+            }
+        if record.grade and record.price is not None:
+            collections[record.collection]["grades"][record.grade] = _intern(format_price(record.price))
 
-    current_name   = None     # collection name we’re inside
-    current_grade  = None     # last "Grade:" seen
+    # convert dict → list for easy iteration
+    return list(collections.values())
 
-    for raw in lines:
-        line = raw.strip()
+def split_records(text):
+    """
+    Split the catalog text on its `---` separators, one block per record.
 
-        # ---------- new collection block ----------
-        if line.startswith("Collection:"):
-            current_name = line.replace("Collection:", "").strip()
-            # create the entry if we haven’t seen this collection before
-            if current_name not in collections:
-                collections[current_name] = {
-                    "collection": current_name,
-                    "grades": {}
-                }
-            current_grade = None
-
-        # ---------- grade ----------
-        elif line.startswith("Grade:"):
-            current_grade = line.replace("Grade:", "").strip()
+    Returns a list of (block_text, fields) where fields holds the
+    "collection", "grade" and "price" ("Your Price") of the block; missing
+    fields are None.
+    """
+    records = []
+    block = []
 
-        # ---------- price ----------
-        elif line.startswith("Your Price:") and current_name and current_grade:
-            price = line.replace("Your Price:", "").strip()
-            collections[current_name]["grades"][current_grade] = price
-            current_grade = None   # reset until we see next Grade:
+    def flush():
+        body = "\n".join(block).strip()
+        block.clear()
+        if not body:
+            return
+        fields = {"collection": None, "grade": None, "price": None}
+        for raw in body.splitlines():
+            line = raw.strip()
+            if line.startswith("Collection:") and fields["collection"] is None:
+                fields["collection"] = line.replace("Collection:", "").strip()
+            elif line.startswith("Grade:") and fields["grade"] is None:
+                fields["grade"] = line.replace("Grade:", "").strip()
+            elif line.startswith("Your Price:") and fields["price"] is None:
+                fields["price"] = line.replace("Your Price:", "").strip()
+        records.append((body, fields))
 
-        # (you can keep descriptions/books if you ever need them)
+    for raw in text.splitlines():
+        if raw.strip() == "---":
+            flush()
+        else:
+            block.append(raw)
+    flush()
 
-    # convert dict → list for easy iteration
-    return list(collections.values())
\ No newline at end of file
+    return records
@@ -0,0 +1,174 @@
+import numpy as np
+
+from filters import grade_range, ranges_overlap
+from parse_book_entries import format_price
+
+
+def _grade_sort_key(label):
+    low_high = grade_range(label)
+    # unrecognised labels go last, in the order they were first seen
+    return (0, *low_high) if low_high else (1, 0, 0)
+
+
+class PriceMatrix:
+    """
+    Dense collections × grade-offerings table of "Your Price" in integer cents.
+
+    Rows follow catalog order (first spelling of a collection name wins,
+    grades are merged, like parse_book_entries). Columns are the distinct
+    grade labels ("Kindergarten", "Grade 3", "Grades 3–5", ...) sorted by
+    the grade interval they cover; `ranges[j]` is that interval. `missing`
+    is True where a collection has no offering for a label, and `prices`
+    holds 0 there.
+    """
+
+    def __init__(self, collections, grades, prices, missing):
+        self.collections = collections
+        self.grades = grades
+        self.prices = prices
+        self.missing = missing
+        self.ranges = [grade_range(g) for g in grades]
+        self._row = {name: i for i, name in enumerate(collections)}
+        self._col = {grade: j for j, grade in enumerate(grades)}
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from BookRecords (iter_records() or a snapshot's records())."""
+        offerings = {}            # name -> {grade: cents}
+        labels = {}
+        for record in records:
+            grades = offerings.setdefault(record.collection, {})
+            if record.grade and record.price is not None:
+                grades[record.grade] = record.price
+                labels.setdefault(record.grade, len(labels))
+
+        collections = list(offerings)
+        grades = sorted(labels, key=lambda g: (_grade_sort_key(g), labels[g]))
+        col = {g: j for j, g in enumerate(grades)}
+
+        prices = np.zeros((len(collections), len(grades)), dtype=np.int64)
+        missing = np.ones(prices.shape, dtype=bool)
+        for i, name in enumerate(collections):
+            for grade, cents in offerings[name].items():
+                prices[i, col[grade]] = cents
+                missing[i, col[grade]] = False
+
+        return cls(collections, grades, prices, missing)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Build from a CatalogSnapshot's collections and offerings sections, so
+        only collection names and grade labels are decoded, never records.
+        Same result as from_records(snapshot.records()).
+        """
+        grade_ids = np.asarray(snapshot.offering_grade_ids)
+        label_ids = np.unique(grade_ids)
+
+        # tie-break labels by the first priced record that uses them, like from_records
+        record_grades = np.asarray(snapshot.grade_ids)
+        priced = np.flatnonzero((np.asarray(snapshot.prices) >= 0) & np.isin(record_grades, label_ids))
+        _, first = np.unique(record_grades[priced], return_index=True)
+        labels = {snapshot.string(int(g)): n for n, g in enumerate(label_ids[np.argsort(first, kind="stable")])}
+
+        collections = [snapshot.string(int(i)) for i in snapshot.collection_name_ids]
+        grades = sorted(labels, key=lambda g: (_grade_sort_key(g), labels[g]))
+        col = {g: j for j, g in enumerate(grades)}
+        col_of_id = np.array([col[snapshot.string(int(g))] for g in label_ids], dtype=np.intp)
+
+        rows = np.repeat(np.arange(len(collections)), np.asarray(snapshot.offering_counts))
+        cols = col_of_id[np.searchsorted(label_ids, grade_ids)]
+        prices = np.zeros((len(collections), len(grades)), dtype=np.int64)
+        missing = np.ones(prices.shape, dtype=bool)
+        prices[rows, cols] = np.asarray(snapshot.offering_prices)
+        missing[rows, cols] = False
+        return cls(collections, grades, prices, missing)
+
+    def updated(self, records, collections):
+        """
+        Copy with only the rows of `collections` recomputed from `records`
+        (every current BookRecord, in file order). Falls back to
+        from_records() when rows or grade columns are added or removed.
+        """
+        records = list(records)
+        if list(dict.fromkeys(r.collection for r in records)) != self.collections:
+            return PriceMatrix.from_records(records)
+
+        prices, missing = self.prices.copy(), self.missing.copy()
+        for name in collections:
+            i = self._row[name]
+            prices[i], missing[i] = 0, True
+            for record in records:
+                if record.collection != name or not record.grade or record.price is None:
+                    continue
+                j = self._col.get(record.grade)
+                if j is None:
+                    return PriceMatrix.from_records(records)
+                prices[i, j], missing[i, j] = record.price, False
+
+        if missing.all(axis=0).any():
+            return PriceMatrix.from_records(records)
+        return PriceMatrix(self.collections, self.grades, prices, missing)
+
+    # ---------- lookups ----------
+
+    def price(self, collection, grade):
+        """Cents for one offering, or None if the collection doesn't offer it."""
+        i, j = self._row.get(collection), self._col.get(grade)
+        if i is None or j is None or self.missing[i, j]:
+            return None
+        return int(self.prices[i, j])
+
+    def offerings(self, collection):
+        """[(grade label, cents), ...] for one collection, in grade order."""
+        i = self._row[collection]
+        return [(self.grades[j], int(self.prices[i, j])) for j in np.flatnonzero(~self.missing[i])]
+
+    def total(self, items):
+        """Sum in cents of [(collection, grade label), ...]."""
+        if not items:
+            return 0
+        rows = np.fromiter((self._row[c] for c, _ in items), dtype=np.intp, count=len(items))
+        cols = np.fromiter((self._col[g] for _, g in items), dtype=np.intp, count=len(items))
+        return int(self.prices[rows, cols].sum())
+
+    # ---------- vectorised queries ----------
+
+    def columns_for(self, grade):
+        """Boolean column mask of the offerings whose grade interval overlaps `grade`."""
+        wanted = grade_range(grade)
+        if wanted is None:
+            return np.zeros(len(self.grades), dtype=bool)
+        return np.array([r is not None and ranges_overlap(r, wanted) for r in self.ranges], dtype=bool)
+
+    def cheapest_for(self, grade):
+        """Per collection, the lowest price (cents) of any offering covering `grade`;
+        -1 where there is none."""
+        if not self.grades:
+            return np.full(len(self.collections), -1, dtype=np.int64)
+        none = np.iinfo(np.int64).max
+        best = np.where(self.missing | ~self.columns_for(grade), none, self.prices).min(axis=1)
+        return np.where(best == none, -1, best)
+
+    def under(self, max_cents, grade=None):
+        """Collections with an offering at or below `max_cents` (optionally for `grade`)."""
+        if grade is None:
+            hits = (~self.missing & (self.prices <= max_cents)).any(axis=1)
+        else:
+            best = self.cheapest_for(grade)
+            hits = (best >= 0) & (best <= max_cents)
+        return [self.collections[i] for i in np.flatnonzero(hits)]
+
+    def cheapest(self):
+        """Per collection: (grade label, cents) of its cheapest offering, or None."""
+        if not self.grades:
+            return [None] * len(self.collections)
+        masked = np.where(self.missing, np.iinfo(np.int64).max, self.prices)
+        return [
+            None if self.missing[i, j] else (self.grades[j], int(self.prices[i, j]))
+            for i, j in enumerate(masked.argmin(axis=1))
+        ]
+
+    def label(self, collection, grade):
+        """Cart selectbox label such as "Grade 3 – $250.00"."""
+        return f"{grade} – {format_price(self.price(collection, grade))}"
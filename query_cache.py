@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from llm_gateway import gateway
+
+CACHE_PATH = os.path.join("data", ".query_cache.sqlite3")
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace, so "3 - 5" and " 3  -  5" match."""
+    return " ".join((text or "").lower().split())
+
+
+class QueryCache:
+    """
+    Persistent cache of generated book lists keyed on the normalised
+    (grade, subject, theme) and the catalog version, with a TTL and LRU
+    eviction. Entries for any other catalog version are never returned, so
+    editing data/book_entries.txt invalidates the cache automatically.
+
+    If `embeddings` is given, a miss falls back to the closest cached search
+    for the same grade whose "subject theme" embedding has cosine similarity
+    of at least `similarity`. The last `memo_size` search embeddings are
+    kept, so the put() after a miss reuses the vector its get() computed.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=24 * 3600, max_entries=1000, embeddings=None, similarity=0.95,
+                 memo_size=64):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity = similarity
+        self.memo_size = memo_size
+        self._vectors = OrderedDict()     # "subject theme" -> float32 embedding, LRU
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " grade TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " vector BLOB,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _key(grade, subject, theme, version):
+        raw = "\0".join([normalize(grade), normalize(subject), normalize(theme), version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _embed(self, subject, theme):
+        text = f"{normalize(subject)} {normalize(theme)}"
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is not None:
+                self._vectors.move_to_end(text)
+                return vector
+
+        # a provider call like any other, so it counts against the gateway's cap
+        with gateway.slot():
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        with self._lock:
+            self._vectors[text] = vector
+            while len(self._vectors) > self.memo_size:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def get(self, grade, subject, theme, version):
+        """Cached answer for this search, or None."""
+        now = time.time()
+        oldest = now - self.ttl
+
+        with self._connect() as conn:
+            key = self._key(grade, subject, theme, version)
+            row = conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created >= ?", (key, oldest)
+            ).fetchone()
+
+            if row is None and self.embeddings is not None:
+                vector = self._embed(subject, theme)
+                # rows from another embedding model (other dimensions) can't be compared
+                rows = conn.execute(
+                    "SELECT key, answer, vector FROM answers"
+                    " WHERE version = ? AND grade = ? AND length(vector) = ? AND created >= ?",
+                    (version, normalize(grade), vector.nbytes, oldest),
+                ).fetchall()
+                if rows:
+                    # every cached vector scored in one matrix product
+                    others = np.empty((len(rows), len(vector)), dtype=np.float32)
+                    for i, (_, _, blob) in enumerate(rows):
+                        others[i] = np.frombuffer(blob, dtype=np.float32)
+                    norms = np.sqrt(np.einsum("ij,ij->i", others, others)) * np.linalg.norm(vector)
+                    scores = np.divide(others @ vector, norms, out=np.zeros(len(rows), dtype=np.float32), where=norms > 0)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        key, row = rows[best][0], (rows[best][1],)
+
+            if row is None:
+                return None
+
+            conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, grade, subject, theme, version, answer):
+        """Store an answer, then drop stale entries and evict least recently used ones."""
+        now = time.time()
+        vector = None
+        if self.embeddings is not None:
+            vector = self._embed(subject, theme).tobytes()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (key, version, grade, query, answer, vector, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(grade, subject, theme, version),
+                    version,
+                    normalize(grade),
+                    f"{normalize(subject)} | {normalize(theme)}",
+                    answer,
+                    vector,
+                    now,
+                    now,
+                ),
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE version != ? OR created < ?", (version, now - self.ttl)
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE key NOT IN"
+                " (SELECT key FROM answers ORDER BY accessed DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers")
@@ -0,0 +1,165 @@
+"""
+Byte-offset index over data/book_entries.txt.
+
+A JSON sidecar (data/book_entries.txt.idx) maps every record id to the
+(offset, length) of its `---` block plus the few fields list views need
+(collection, grade, price). The text file itself is mmapped, and a full
+BookRecord (description, book titles) is only decoded when asked for. The
+sidecar is rebuilt whenever the text file's size or mtime changes.
+"""
+import json
+import mmap
+import os
+import threading
+
+from parse_book_entries import parse_records
+
+INDEX_VERSION = 1
+
+
+def record_id(collection, grade, seen):
+    """
+    Stable id for a record: "Collection / Grade", with "#2", "#3", ... for
+    repeats of the same pair. `seen` counts pairs already assigned.
+    """
+    base = f"{collection} / {grade}"
+    seen[base] = seen.get(base, 0) + 1
+    return base if seen[base] == 1 else f"{base} #{seen[base]}"
+
+
+def iter_blocks(buf):
+    """Yield (offset, length) of every non-empty `---` block in a bytes-like buffer."""
+    start = pos = 0
+    size = len(buf)
+    while pos < size:
+        end = buf.find(b"\n", pos)
+        end = size if end == -1 else end + 1
+        if buf[pos:end].strip() == b"---":
+            if buf[start:pos].strip():
+                yield start, pos - start
+            start = end
+        pos = end
+    if buf[start:size].strip():
+        yield start, size - start
+
+
+def decode_block(buf, offset, length):
+    """The BookRecord stored at buf[offset:offset + length], or None."""
+    text = bytes(buf[offset:offset + length]).decode("utf-8")
+    return next(parse_records(text.splitlines()), None)
+
+
+def build_index(file_path):
+    """Scan `file_path` once and return the sidecar contents."""
+    stat = os.stat(file_path)
+    with open(file_path, "rb") as f:
+        buf = f.read()
+
+    seen = {}
+    records = []
+    for offset, length in iter_blocks(buf):
+        record = decode_block(buf, offset, length)
+        if record is None:
+            continue
+        rid = record_id(record.collection, record.grade, seen)
+        records.append([rid, offset, length, record.collection, record.grade, record.price])
+
+    return {
+        "version": INDEX_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "records": records,
+    }
+
+
+class RecordIndex:
+    """Lazy, offset-indexed access to the records of one catalog file."""
+
+    def __init__(self, file_path="data/book_entries.txt", index_path=None):
+        self.file_path = file_path
+        self.index_path = index_path or file_path + ".idx"
+        self._lock = threading.Lock()
+        self._stat = None
+        self._mmap = None
+        self._entries = {}
+        self._refresh()
+
+    def _stale(self, index):
+        stat = os.stat(self.file_path)
+        return (
+            index.get("version") != INDEX_VERSION
+            or index.get("source_size") != stat.st_size
+            or index.get("source_mtime_ns") != stat.st_mtime_ns
+        )
+
+    def _refresh(self):
+        """(Re)load the sidecar and remap the file if the text changed."""
+        stat = os.stat(self.file_path)
+        if self._stat and (self._stat.st_size, self._stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = None
+
+        if index is None or self._stale(index):
+            index = build_index(self.file_path)
+            tmp_path = f"{self.index_path}.tmp-{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+        with open(self.file_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        self._entries = {rid: (offset, length, collection, grade, price)
+                         for rid, offset, length, collection, grade, price in index["records"]}
+        self._stat = stat
+
+    def ids(self):
+        """Record ids in file order."""
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def summary(self, rid):
+        """(collection, grade, price in cents) without touching the text file."""
+        with self._lock:
+            self._refresh()
+            _, _, collection, grade, price = self._entries[rid]
+            return collection, grade, price
+
+    def find(self, collection, grade):
+        """Id of the first record for (collection, grade), or None."""
+        with self._lock:
+            self._refresh()
+            rid = f"{collection} / {grade}"
+            return rid if rid in self._entries else None
+
+    def text(self, rid):
+        """Raw text of one record block."""
+        with self._lock:
+            self._refresh()
+            offset, length = self._entries[rid][:2]
+            return bytes(self._mmap[offset:offset + length]).decode("utf-8")
+
+    def record(self, rid):
+        """The full BookRecord for one id, decoded from the mmapped file on demand."""
+        with self._lock:
+            self._refresh()
+            offset, length = self._entries[rid][:2]
+            return decode_block(self._mmap, offset, length)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_record_index(file_path="data/book_entries.txt"):
+    """Process-wide RecordIndex for `file_path`."""
+    path = os.path.abspath(file_path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = RecordIndex(path)
+        return _indexes[path]
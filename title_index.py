@@ -0,0 +1,104 @@
+import bisect
+import re
+import unicodedata
+
+
+def fold_text(text):
+    """Casefold, drop accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text.replace("’", "").replace("'", ""))
+    return " ".join(text.split())
+
+
+def normalize_title(title):
+    """
+    Search keys for one catalog title: the folded title with "(Sp)" and
+    trailing "*" markers removed, plus each half of a bilingual
+    "English / Spanish" title.
+    """
+    title = re.sub(r"\(sp\)", "", title, flags=re.IGNORECASE).replace("*", "")
+    keys = [fold_text(title)]
+    if "/" in title:
+        keys += [fold_text(part) for part in title.split("/")]
+    return [k for i, k in enumerate(keys) if k and k not in keys[:i]]
+
+
+class TitleIndex:
+    """
+    Inverted index from normalised book title to the (collection, grade)
+    offerings that include it. Keys are kept sorted, so exact lookups are a
+    dict hit and prefix lookups a binary search.
+    """
+
+    def __init__(self):
+        self._postings = {}       # key -> {(title, collection, grade): None, ...}, an ordered set
+        self._keys = []
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from BookRecords (iter_records() or a snapshot's records())."""
+        index = cls()
+        for record in records:
+            for title in record.titles:
+                index._add(title, record.collection, record.grade)
+        index._keys = sorted(index._postings)
+        return index
+
+    def _add(self, title, collection, grade):
+        posting = (title, collection, grade)
+        for key in normalize_title(title):
+            self._postings.setdefault(key, {})[posting] = None
+
+    def updated(self, removed, added):
+        """
+        Copy of the index with the postings of `removed` BookRecords dropped
+        and those of `added` inserted; untouched postings lists are shared.
+        """
+        index = TitleIndex()
+        index._postings = dict(self._postings)
+        gone = {(r.collection, r.grade) for r in removed}
+        for record in removed:
+            for title in record.titles:
+                for key in normalize_title(title):
+                    postings = {p: None for p in index._postings.get(key, ()) if p[1:] not in gone}
+                    if postings:
+                        index._postings[key] = postings
+                    else:
+                        index._postings.pop(key, None)
+        for record in added:
+            for title in record.titles:
+                for key in normalize_title(title):
+                    if index._postings.get(key) is self._postings.get(key):
+                        index._postings[key] = dict(index._postings.get(key, {}))
+                index._add(title, record.collection, record.grade)
+        index._keys = sorted(index._postings)
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, title):
+        """Postings [(title, collection, grade), ...] for an exact title match."""
+        keys = normalize_title(title)
+        return list(self._postings.get(keys[0], ())) if keys else []
+
+    def prefix(self, text, limit=20):
+        """Postings for every title starting with `text`, up to `limit` titles."""
+        query = fold_text(re.sub(r"\(sp\)", "", text, flags=re.IGNORECASE).replace("*", ""))
+        if not query:
+            return []
+
+        results = []
+        seen = set()
+        titles = set()
+        for i in range(bisect.bisect_left(self._keys, query), len(self._keys)):
+            key = self._keys[i]
+            if not key.startswith(query) or len(titles) >= limit:
+                break
+            for posting in self._postings[key]:
+                if posting not in seen:
+                    seen.add(posting)
+                    titles.add(posting[0])
+                    results.append(posting)
+        return results